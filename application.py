@@ -1,21 +1,206 @@
 # -*- coding: utf-8 -*-
 
-import plotly.graph_objects as go
-import pandas as pd
+import base64
+import json
+import os
+import threading
 import numpy as np
 import dash
 import dash_bootstrap_components as dbc
 import dash_core_components as dcc
 import dash_html_components as html
-from dash.dependencies import Input, Output, State
+from dash.dependencies import ClientsideFunction, Input, Output, State
+from dash.exceptions import PreventUpdate
+from flask import has_request_context
+from plotly.utils import PlotlyJSONEncoder
+
+from cache import LRUCache, SharedCache, canonical_filter_key, dataset_version
+from figures import FigureBundle, glacier_figures
+from glacier_index import (
+    GlacierFilterIndex,
+    GlacierGrid,
+    GlacierPositions,
+    StringColumn,
+    TimeSeriesIndex,
+)
+from metrics import CallbackMetrics
+from storage import DetailStore, detail_columns, read_table, table_names, table_path
 
 
 # Data Import
-df_combined = pd.read_pickle("wgms_combined")
-df_thickness = pd.read_pickle("wgms_thickness")
-df_massbalance = pd.read_pickle("wgms_massbalance")
-df_length = pd.read_pickle("wgms_length")
-df_area = pd.read_pickle("wgms_area")
+data_dir = os.environ.get("WGMS_DATA_DIR", ".")
+
+# Optional lazy startup, enabled with WGMS_LAZY_STARTUP=1: importing this module
+# only defines the app and its callbacks, and the tables and the indexes built
+# from them are loaded by load_datasets() before the first request is handled,
+# which is also when pandas is imported. Workers then boot quickly, and the first
+# request of each one waits for the data. Without it, the data is loaded on
+# import. With WGMS_PRELOAD=1 either way it is loaded once in the gunicorn
+# master, see gunicorn.conf.py.
+lazy_startup = bool(int(os.environ.get("WGMS_LAZY_STARTUP", 0)))
+
+# Tables and indexes, set by load_datasets()
+df_combined = df_thickness = df_massbalance = df_length = df_area = None
+glacier_positions = info_columns = filter_index = None
+map_grid = cluster_max_level = marker_table = None
+thickness_index = massbalance_index = length_index = area_index = None
+datasets_lock = threading.Lock()
+
+
+def load_datasets():
+    """Load the tables and build the indexes used by the callbacks, once"""
+
+    global df_combined, df_thickness, df_massbalance, df_length, df_area
+    global glacier_positions, info_columns, filter_index
+    global map_grid, cluster_max_level, marker_table
+    global thickness_index, massbalance_index, length_index, area_index
+
+    with datasets_lock:
+        if df_combined is not None:
+            return
+
+        df_combined = read_table(data_dir, "wgms_combined")
+        df_thickness = read_table(data_dir, "wgms_thickness")
+        df_massbalance = read_table(data_dir, "wgms_massbalance")
+        df_length = read_table(data_dir, "wgms_length")
+        df_area = read_table(data_dir, "wgms_area")
+
+        # Row position of each glacier in df_combined
+        glacier_positions = GlacierPositions(df_combined["WGMS_ID"].to_numpy())
+
+        # Info panel fields that only depend on df_combined, formatted once into
+        # buffers that stay shared with forked workers
+        info_columns = dict(
+            NAME=StringColumn(df_combined["NAME"].to_numpy()),
+            POLITICAL_UNIT=StringColumn(df_combined["POLITICAL_UNIT"].to_numpy()),
+            ELEVATION=StringColumn(
+                elevation_helper(
+                    df_combined["LOWEST_ELEVATION"], df_combined["HIGHEST_ELEVATION"]
+                )
+            ),
+            LAT_LONG=StringColumn(
+                df_combined["LATITUDE"].map("{:.2f}".format)
+                + ", "
+                + df_combined["LONGITUDE"].map("{:.2f}".format)
+            ),
+        )
+
+        # Bitmap index used by glacier_filter_helper
+        filter_index = GlacierFilterIndex(df_combined)
+
+        # Spatial index of the clustered map, see map_clustering
+        map_grid = GlacierGrid(df_combined)
+        cluster_max_level = map_grid.view(cluster_max_zoom)[0]
+
+        # Per-glacier offsets into the time series used by update_glacier_figures
+        thickness_index = TimeSeriesIndex(df_thickness)
+        massbalance_index = TimeSeriesIndex(df_massbalance)
+        length_index = TimeSeriesIndex(df_length)
+        area_index = TimeSeriesIndex(df_area)
+
+        # Time series rows per glacier, summed by num_data_points_helper
+        df_combined["NUM_DATA_POINTS"] = sum(
+            index.counts(df_combined["WGMS_ID"])
+            for index in [thickness_index, massbalance_index, length_index, area_index]
+        )
+
+        if compact_map:
+            marker_table = compact_marker_table()
+
+
+# Free text columns for the glacier info panel, read one glacier at a time from
+# the side table written by data_import.py
+detail_store = None
+if os.path.exists(os.path.join(data_dir, "wgms_details.db")):
+    detail_store = DetailStore(os.path.join(data_dir, "wgms_details.db"))
+
+
+def glacier_details(wgms_id):
+    """Free text columns of one glacier"""
+
+    if detail_store is not None:
+        return detail_store.get(wgms_id)
+
+    # Tables written before the side table existed keep the text inline
+    return df_combined.iloc[glacier_positions[wgms_id]][detail_columns].to_dict()
+
+
+# Info panel values for recently selected glaciers
+info_cache = LRUCache(int(os.environ.get("WGMS_DETAILS_CACHE_SIZE", 256)))
+
+
+def elevation_helper(lowest, highest):
+    """Format elevation ranges of all glaciers, e.g. "2100 to 3600" """
+
+    lowest = lowest.map("{:.0f}".format).where(lowest.notna(), "N/A")
+    highest = highest.map("{:.0f}".format).where(highest.notna(), "N/A")
+    return (lowest + " to " + highest).to_numpy()
+
+
+# Optional zoom-aware satellite map, enabled with WGMS_MAP_CLUSTERING=1: below
+# cluster_max_zoom nearby glaciers are drawn as one marker per quadtree cell, and
+# only glaciers inside the current view, found with the map_grid spatial index,
+# are sent
+map_clustering = bool(int(os.environ.get("WGMS_MAP_CLUSTERING", 0)))
+cluster_max_zoom = 6
+# Largest map the page draws, in pixels, for views known only by their centre
+map_pixels = (2560, 350)
+
+# Source files that build cached outputs, hashed with the data files so that no
+# cache serves outputs of an older version of them
+code_files = [__file__] + [
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+    for name in ["figures.py", "glacier_index.py"]
+]
+
+# Optional compact satellite map, enabled with WGMS_COMPACT_MAP=1 unless the map
+# is clustered: glacier names and positions are sent to the browser once per
+# dataset version and kept in its local storage, and filter changes only send
+# the filtered rows, which assets/wgms_map.js turns into the figure.
+# WGMS_CLIENT_FILTERING=1 also sends the filter columns, and the browser applies
+# the filters itself without calling the server.
+client_filtering = not map_clustering and bool(
+    int(os.environ.get("WGMS_CLIENT_FILTERING", 0))
+)
+compact_map = client_filtering or (
+    not map_clustering and bool(int(os.environ.get("WGMS_COMPACT_MAP", 0)))
+)
+if compact_map:
+    marker_version = dataset_version(
+        [table_path(data_dir, "wgms_combined")] + code_files
+    )
+
+# Precision of marker coordinates sent to the browser, about 10 m
+coordinate_decimals = 4
+
+
+# Glacier figures pre-rendered by data_import.py, if the bundle is present
+figure_bundle = None
+if os.path.exists(os.path.join(data_dir, "wgms_figures")):
+    figure_bundle = FigureBundle(os.path.join(data_dir, "wgms_figures"))
+
+# Satellite map figure and info box values for recently used filter combinations,
+# each weighed by the length of its JSON. Besides WGMS_MAP_CACHE_SIZE entries,
+# WGMS_MAP_CACHE_MB bounds that total in each worker: the map of every glacier of
+# the 2019 release is about 1.4 MB, and grows with the catalog.
+satellite_map_cache = LRUCache(
+    int(os.environ.get("WGMS_MAP_CACHE_SIZE", 256)),
+    maxbytes=int(float(os.environ.get("WGMS_MAP_CACHE_MB", 64)) * 2 ** 20),
+)
+
+# Optional cache shared by all workers, enabled by pointing WGMS_SHARED_CACHE at a
+# SQLite file, which keeps the recently used outputs within WGMS_SHARED_CACHE_MB.
+# Hashing code_files too invalidates outputs from older app versions.
+shared_cache = None
+if os.environ.get("WGMS_SHARED_CACHE"):
+    shared_cache = SharedCache(
+        os.environ["WGMS_SHARED_CACHE"],
+        dataset_version(
+            [table_path(data_dir, name) for name in table_names] + code_files
+        ),
+        encoder=PlotlyJSONEncoder,
+        maxbytes=int(float(os.environ.get("WGMS_SHARED_CACHE_MB", 256)) * 2 ** 20),
+    )
 
 
 # Default selection is Mer De Glace, WGMS_ID = 353
@@ -27,6 +212,14 @@ app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP,],)
 
 application = app.server
 
+# Optional latency and payload histograms of every callback, enabled with
+# WGMS_METRICS=1 and served to local clients on /metrics in the Prometheus text
+# format. Each worker process keeps and serves its own.
+callback_metrics = CallbackMetrics(bool(int(os.environ.get("WGMS_METRICS", 0))))
+callback_metrics.instrument(app)
+callback_metrics.watch_cache("satellite_map", satellite_map_cache)
+callback_metrics.watch_cache("glacier_info", info_cache)
+
 # Checkbox styling
 cb_inputStyle = {"vertical-align": "middle", "margin": "auto"}
 cb_labelStyle = {"vertical-align": "middle"}
@@ -328,6 +521,17 @@ modebar_config = {
     ]
 }
 
+# Data of the compact satellite map, see compact_map
+map_stores = []
+if compact_map:
+    map_stores = [
+        dcc.Store(id="marker_version", data=marker_version),
+        dcc.Store(id="marker_table_request"),
+        dcc.Store(id="marker_table", storage_type="local"),
+    ]
+    if not client_filtering:
+        map_stores.append(dcc.Store(id="map_rows"))
+
 # Layout
 app.layout = dbc.Container(
     [
@@ -466,7 +670,8 @@ app.layout = dbc.Container(
                                                     id="mapbox",
                                                     config=modebar_config_satellite,
                                                 ),
-                                            ],
+                                            ]
+                                            + map_stores,
                                             className="satellite_container",
                                         ),
                                         width=12,
@@ -611,26 +816,6 @@ app.layout = dbc.Container(
 )
 
 
-no_data_fig = dict(
-    layout=dict(
-        xaxis={"visible": False},
-        yaxis={"visible": False},
-        autosize=True,
-        height=200,
-        margin=dict(l=40, r=20, b=20, t=20, pad=1),
-        annotations=[
-            dict(
-                text="No Available Data",
-                xref="paper",
-                yref="paper",
-                showarrow=False,
-                font={"size": 14},
-            )
-        ],
-    )
-)
-
-
 # Extend time series -- not used
 def ts_extend_helper(df):
     """Extend timeseries of length one with a zero measurement in 2020 for plotting purposes"""
@@ -658,69 +843,278 @@ def glacier_filter_helper(
 ):
     """Apply glacier selection filters to dataframe"""
 
-    # Default is to display all data
-    dropdown_all = list(range(11))
-    if not prim_classific:
-        prim_classific = dropdown_all
-    if not form:
-        form = dropdown_all
-    if not frontal_chars:
-        frontal_chars = dropdown_all
-
-    checkbox_mb = [True] if checkbox_mb == [1] else [True, False]
-    checkbox_length = [True] if checkbox_length == [1] else [True, False]
-    checkbox_tc = [True] if checkbox_tc == [1] else [True, False]
-    checkbox_area = [True] if checkbox_area == [1] else [True, False]
-
-    # Apply Filters
-    dff = (
-        df.query("FIRST_MEAS <= @first_meas")
-        .query("YEAR_MEASUREMENTS >= @years_data")
-        .query("PRIM_CLASSIFIC in @prim_classific")
-        .query("FORM in @form")
-        .query("FRONTAL_CHARS in @frontal_chars")
-        .query("THICKNESS_CHANGE_TS in @checkbox_tc")
-        .query("LENGTH_TS in @checkbox_length")
-        .query("AREA_TS in @checkbox_area")
-        .query("MASS_BALANCE_TS in @checkbox_mb")
+    index = filter_index if df is df_combined else GlacierFilterIndex(df)
+    mask = index.mask(
+        first_meas,
+        years_data,
+        prim_classific,
+        form,
+        frontal_chars,
+        checkbox_mb,
+        checkbox_length,
+        checkbox_tc,
+        checkbox_area,
     )
 
-    return dff
+    return df[mask]
 
 
-def num_data_points_helper(unique_ids):
-    """Determine total number of datapoints in thickness, mass balance, and length variation datasets for a set of wgms id's"""
+def num_data_points_helper(df):
+    """Determine total number of datapoints in thickness, mass balance, length, and area datasets for filtered glaciers"""
 
-    dfs = [df_thickness, df_massbalance, df_length, df_area]
-    num_data_points = sum(
-        [df[df["WGMS_ID"].isin(unique_ids)].iloc[:, 0].count() for df in dfs]
-    )
-    return num_data_points
+    return int(df["NUM_DATA_POINTS"].sum())
+
+
+def glacier_info_helper(wgms_id):
+    """Values of the Detailed Information Panel fields for one glacier"""
+
+    info = info_cache.get(wgms_id)
+    if info is not None:
+        return info
+
+    i = glacier_positions[wgms_id]
+    info = {key: values[i] for key, values in info_columns.items()}
+    info["WGMS_ID"] = wgms_id
+    info.update(glacier_details(wgms_id))
+
+    # Special considerations for Reference
+    if len(info["REFERENCE"]) > 100:
+        info["REFERENCE"] = info["REFERENCE"][0:100] + "..."
+
+    info_cache.put(wgms_id, info)
+    return info
 
 
 # Satellite Map
 
 
-@app.callback(
-    [
-        Output(component_id="mapbox", component_property="figure"),
-        Output(component_id="num_glaciers", component_property="children"),
-        Output(component_id="earliest_record", component_property="children"),
-        Output(component_id="num_countries", component_property="children"),
-        Output(component_id="num_data_points", component_property="children"),
-    ],
-    [
-        Input(component_id="first_measurement_slider", component_property="value"),
-        Input(component_id="years_data_slider", component_property="value"),
-        Input(component_id="prim_classific_dropdown", component_property="value"),
-        Input(component_id="form_dropdown", component_property="value"),
-        Input(component_id="frontal_chars_dropdown", component_property="value"),
-        Input(component_id="checkbox_mb", component_property="value"),
-        Input(component_id="checkbox_length", component_property="value"),
-        Input(component_id="checkbox_tc", component_property="value"),
-        Input(component_id="checkbox_area", component_property="value"),
-    ],
-)
+def map_view(relayout_data, figure=None):
+    """Quadtree cell range of the map view described by the mapbox relayoutData
+
+    Relayouts that do not pan or zoom, such as a window resize, have no
+    mapbox keys, and the modebar's reset has no corners. The zoom and centre
+    then come from `figure`, the map as currently drawn, whose layout the
+    browser keeps up to date with the view.
+    """
+
+    relayout_data = relayout_data or {}
+    mapbox = ((figure or {}).get("layout") or {}).get("mapbox") or {}
+    zoom = relayout_data.get("mapbox.zoom", mapbox.get("zoom", 0))
+    corners = relayout_data.get("mapbox._derived", {}).get("coordinates")
+    if corners:
+        lon, lat = zip(*corners)
+        return map_grid.view(zoom, (min(lon), max(lon), min(lat), max(lat)))
+
+    center = relayout_data.get("mapbox.center", mapbox.get("center"))
+    if center is None:
+        return map_grid.view(zoom)
+    return map_grid.view_around(zoom, (center["lon"], center["lat"]), map_pixels)
+
+
+def map_moved(relayout_data):
+    """False when the map callback was triggered by a relayout that kept the view"""
+
+    if not has_request_context():
+        return True
+    triggered = [item["prop_id"] for item in dash.callback_context.triggered]
+    return triggered != ["mapbox.relayoutData"] or any(
+        key.startswith("mapbox.") for key in relayout_data or {}
+    )
+
+
+def glacier_trace(df):
+    """Scattermapbox trace with one marker per glacier of `df`"""
+
+    return dict(
+        type="scattermapbox",
+        lon=df["LONGITUDE"].round(coordinate_decimals),
+        lat=df["LATITUDE"].round(coordinate_decimals),
+        customdata=df.loc[:, ["NAME", "WGMS_ID"]].values,
+        mode="markers",
+        marker=dict(size=8, opacity=0.7),
+        hovertemplate="<b>%{customdata[0]}</b><br>Lat: %{lat:.2f} <br>Lon: %{lon:.2f}<extra></extra>",
+    )
+
+
+def clustered_traces(selected, view):
+    """Glacier and cluster traces for the glaciers of df_combined in `view`
+
+    `selected` is the boolean row mask of the filtered glaciers.
+    """
+
+    level = view[0]
+    rows = map_grid.query(view)
+    rows = rows[selected[rows]]
+    if level >= cluster_max_level:
+        return [glacier_trace(df_combined.iloc[rows])]
+
+    lon, lat, counts, first = map_grid.clusters(rows, level)
+    single = counts == 1
+    clusters = dict(
+        type="scattermapbox",
+        lon=lon[~single],
+        lat=lat[~single],
+        text=counts[~single],
+        mode="markers",
+        marker=dict(size=8 + 4 * np.log2(counts[~single]), opacity=0.7),
+        hovertemplate="<b>%{text} glaciers</b><br>Zoom in to select one<extra></extra>",
+    )
+    return [glacier_trace(df_combined.iloc[first[single]]), clusters]
+
+
+def map_layout():
+    """Layout of the satellite map figure"""
+
+    layout = dict(
+        mapbox_style="stamen-terrain",
+        mapbox_center_lat=0,
+        mapbox_center_lon=0,
+        mapbox_zoom=0,
+        mapbox=dict(style="stamen-terrain", zoom=0, center=dict(lat=0, lon=0)),
+        # autosize=True,
+        height=350,
+        margin=dict(l=0, r=0, b=0, t=0, pad=0),
+        legend=dict(font=dict(size=10), orientation="h"),
+    )
+    if map_clustering:
+        # Keep the user's zoom and position when the markers are replaced
+        layout["uirevision"] = "satellite_map"
+        layout["showlegend"] = False
+    return layout
+
+
+def encode_rows(selected):
+    """Rows of the boolean mask `selected` as a list or a base64 bitmap, whichever is shorter"""
+
+    rows = np.flatnonzero(selected)
+    bitmap = base64.b64encode(np.packbits(selected)).decode()
+    if len(rows) * (len(str(len(selected))) + 1) < len(bitmap):
+        return {"rows": rows.tolist()}
+    return {"bitmap": bitmap}
+
+
+map_inputs = [
+    Input(component_id="first_measurement_slider", component_property="value"),
+    Input(component_id="years_data_slider", component_property="value"),
+    Input(component_id="prim_classific_dropdown", component_property="value"),
+    Input(component_id="form_dropdown", component_property="value"),
+    Input(component_id="frontal_chars_dropdown", component_property="value"),
+    Input(component_id="checkbox_mb", component_property="value"),
+    Input(component_id="checkbox_length", component_property="value"),
+    Input(component_id="checkbox_tc", component_property="value"),
+    Input(component_id="checkbox_area", component_property="value"),
+]
+map_state = []
+if map_clustering:
+    map_inputs.append(Input(component_id="mapbox", component_property="relayoutData"))
+    map_state.append(State(component_id="mapbox", component_property="figure"))
+
+# The compact map without client-side filtering sends the filtered rows instead
+# of the figure
+map_figure = Output(component_id="mapbox", component_property="figure")
+if compact_map and not client_filtering:
+    map_figure = Output(component_id="map_rows", component_property="data")
+
+map_outputs = [
+    map_figure,
+    Output(component_id="num_glaciers", component_property="children"),
+    Output(component_id="earliest_record", component_property="children"),
+    Output(component_id="num_countries", component_property="children"),
+    Output(component_id="num_data_points", component_property="children"),
+]
+
+
+def filter_columns(df):
+    """Filterable columns of `df` as compact integer lists for assets/wgms_map.js
+
+    Missing years become values no slider position selects, and missing codes
+    -1, so the browser drops those glaciers like GlacierFilterIndex does.
+    """
+
+    def integers(column, missing):
+        return np.nan_to_num(df[column].to_numpy(dtype=float), nan=missing)
+
+    columns = dict(
+        FIRST_MEAS=integers("FIRST_MEAS", 9999),
+        YEAR_MEASUREMENTS=integers("YEAR_MEASUREMENTS", -1),
+        NUM_DATA_POINTS=integers("NUM_DATA_POINTS", 0),
+    )
+    for column in GlacierFilterIndex.category_columns:
+        columns[column] = integers(column, -1)
+    columns = {key: values.astype(int).tolist() for key, values in columns.items()}
+
+    # Time series flags as the bits of one integer, in flag_columns order
+    columns["FLAGS"] = sum(
+        (df[column].to_numpy() == True).astype(int) << bit
+        for bit, column in enumerate(GlacierFilterIndex.flag_columns)
+    ).tolist()
+
+    political_unit = df["POLITICAL_UNIT"].astype("category")
+    columns["POLITICAL_UNIT"] = political_unit.cat.codes.tolist()
+    return columns
+
+
+def compact_marker_table():
+    """Everything assets/wgms_map.js needs to draw any filtered set of glaciers"""
+
+    table = dict(
+        version=marker_version,
+        lon=df_combined["LONGITUDE"].round(coordinate_decimals).tolist(),
+        lat=df_combined["LATITUDE"].round(coordinate_decimals).tolist(),
+        name=df_combined["NAME"].tolist(),
+        wgms_id=df_combined["WGMS_ID"].tolist(),
+        trace={
+            key: value
+            for key, value in glacier_trace(df_combined.iloc[:0]).items()
+            if key not in ["lon", "lat", "customdata"]
+        },
+        layout=map_layout(),
+    )
+    if client_filtering:
+        table["filters"] = filter_columns(df_combined)
+    return table
+
+
+if compact_map:
+    app.clientside_callback(
+        ClientsideFunction(namespace="wgms", function_name="marker_table_request"),
+        Output(component_id="marker_table_request", component_property="data"),
+        [Input(component_id="marker_table", component_property="modified_timestamp")],
+        [
+            State(component_id="marker_version", component_property="data"),
+            State(component_id="marker_table", component_property="data"),
+        ],
+    )
+
+    @app.callback(
+        Output(component_id="marker_table", component_property="data"),
+        [Input(component_id="marker_table_request", component_property="data")],
+    )
+    def send_marker_table(version):
+        """Marker table, when the browser does not have the current version"""
+
+        if version is None:
+            raise PreventUpdate
+        return marker_table
+
+    if client_filtering:
+        app.clientside_callback(
+            ClientsideFunction(namespace="wgms", function_name="filter_map"),
+            map_outputs,
+            map_inputs
+            + [Input(component_id="marker_table", component_property="data")],
+        )
+    else:
+        app.clientside_callback(
+            ClientsideFunction(namespace="wgms", function_name="satellite_map"),
+            Output(component_id="mapbox", component_property="figure"),
+            [
+                Input(component_id="map_rows", component_property="data"),
+                Input(component_id="marker_table", component_property="data"),
+            ],
+        )
+
+
 def update_satellite_map(
     first_meas,
     years_data,
@@ -731,11 +1125,12 @@ def update_satellite_map(
     checkbox_length,
     checkbox_tc,
     checkbox_area,
+    relayout_data=None,
+    figure=None,
 ):
     """Update main satellite map and four info boxes above it based on selected filters """
 
-    df = glacier_filter_helper(
-        df_combined,
+    cache_key = canonical_filter_key(
         first_meas,
         years_data,
         prim_classific,
@@ -746,48 +1141,92 @@ def update_satellite_map(
         checkbox_tc,
         checkbox_area,
     )
-
-    num_glaciers = f"{len(df.index):,}"
-    first_meas = df["FIRST_MEAS"].min()
-    earliest_record = f"{first_meas:.0f}" if first_meas is not np.nan else f"N/A"
-    num_countries = df["POLITICAL_UNIT"].nunique()
-    unique_ids = df["WGMS_ID"].unique()
-    num_data_points = f"{num_data_points_helper(unique_ids):,}"
-
-    map_data = [
-        dict(
-            type="scattermapbox",
-            lon=df["LONGITUDE"],
-            lat=df["LATITUDE"],
-            customdata=df.loc[:, ["NAME", "WGMS_ID"]].values,
-            tname=df["NAME"].values,
-            mode="markers",
-            marker=go.scattermapbox.Marker(size=8, opacity=0.7),
-            hovertemplate="<b>%{customdata[0]}</b><br>Lat: %{lat:.2f} <br>Lon: %{lon:.2f}<extra></extra>",
+    view = None
+    if map_clustering:
+        if not map_moved(relayout_data):
+            raise PreventUpdate
+        view = map_view(relayout_data, figure)
+        cache_key += (view,)
+    elif compact_map:
+        cache_key += ("rows",)
+
+    cached = satellite_map_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    if shared_cache is not None:
+        encoded = shared_cache.get_encoded("satellite_map", cache_key)
+        if encoded is not None:
+            outputs = json.loads(encoded)
+            satellite_map_cache.put(cache_key, outputs, len(encoded))
+            return outputs
+
+    with callback_metrics.phase("filter"):
+        # Positional row mask of df_combined, which the compact and clustered
+        # maps select their glaciers with
+        selected = filter_index.mask(
+            first_meas,
+            years_data,
+            prim_classific,
+            form,
+            frontal_chars,
+            checkbox_mb,
+            checkbox_length,
+            checkbox_tc,
+            checkbox_area,
         )
-    ]
-
-    layout = dict(
-        mapbox_style="stamen-terrain",
-        mapbox_center_lat=0,
-        mapbox_center_lon=0,
-        mapbox_zoom=0,
-        mapbox=dict(style="stamen-terrain", zoom=0, center=dict(lat=0, lon=0)),
-        # autosize=True,
-        height=350,
-        margin=dict(l=0, r=0, b=0, t=0, pad=0),
-        legend=dict(font=dict(size=10), orientation="h"),
-    )
-
-    satellite_map = dict(data=map_data, layout=layout)
+        df = df_combined[selected]
+
+    with callback_metrics.phase("count"):
+        num_glaciers = f"{len(df.index):,}"
+        first_meas = df["FIRST_MEAS"].min()
+        earliest_record = f"{first_meas:.0f}" if first_meas is not np.nan else f"N/A"
+        num_countries = df["POLITICAL_UNIT"].nunique()
+        num_data_points = f"{num_data_points_helper(df):,}"
+
+    with callback_metrics.phase("figure"):
+        if compact_map:
+            satellite_map = encode_rows(selected)
+        elif view is None:
+            satellite_map = dict(data=[glacier_trace(df)], layout=map_layout())
+        else:
+            satellite_map = dict(
+                data=clustered_traces(selected, view), layout=map_layout()
+            )
 
-    return (
+    outputs = (
         satellite_map,
         num_glaciers,
         earliest_record,
         num_countries,
         num_data_points,
     )
+    # Serialized once, to weigh the entry and for the shared cache
+    encoded = json.dumps(outputs, cls=PlotlyJSONEncoder)
+    satellite_map_cache.put(cache_key, outputs, len(encoded))
+    if shared_cache is not None:
+        shared_cache.put_encoded("satellite_map", cache_key, encoded)
+
+    return outputs
+
+
+if not client_filtering:
+    app.callback(map_outputs, map_inputs, map_state)(update_satellite_map)
+
+
+def selected_glacier(clickdata):
+    """WGMS_ID of the glacier clicked on the map, Mer de Glace before any click
+
+    Clicks on a cluster marker, which has no customdata, leave the selection
+    unchanged.
+    """
+
+    if not clickdata:
+        return mer_de_glace
+    point = clickdata["points"][0]
+    if "customdata" not in point:
+        raise PreventUpdate
+    return point["customdata"][1]
 
 
 @app.callback(
@@ -806,14 +1245,9 @@ def update_satellite_map(
 )
 def update_glacier_info_div(input_value):
     """Update Detailed Information Panel based on satellite map clickdata"""
-    wgms_id = mer_de_glace
+    wgms_id = selected_glacier(input_value)
     outputs = []
 
-    if input_value:
-        point_data = input_value["points"][0]
-        wgms_id = point_data["customdata"][1]
-
-    df = df_combined[df_combined["WGMS_ID"] == wgms_id].reset_index()
     text_keys = dict(
         NAME="Name:",
         WGMS_ID="WGMS Id:",
@@ -825,29 +1259,11 @@ def update_glacier_info_div(input_value):
         SPONS_AGENCY="Sponsoring Agency:",
         REMARKS="Remarks:",
     )
+    with callback_metrics.phase("lookup"):
+        info = glacier_info_helper(wgms_id)
 
     for key, text in text_keys.items():
-
-        if key not in ["ELEVATION", "LAT_LONG"]:
-            value = df.at[0, key]
-        elif key == "ELEVATION":
-            he = df.at[0, "HIGHEST_ELEVATION"]
-            le = df.at[0, "LOWEST_ELEVATION"]
-
-            highest_elev = f"{he:.0f}" if not np.isnan(he) else "N/A"
-            lowest_elev = f"{le:.0f}" if not np.isnan(le) else "N/A"
-
-            value = f"{lowest_elev} to {highest_elev}"
-
-        elif key == "LAT_LONG":
-            value = f"{df.at[0,'LATITUDE']:.2f}, {df.at[0,'LONGITUDE']:.2f}"
-
-        # Special considerations for Elevation, Lat/Long, and Reference
-        if key == "REFERENCE":
-            if len(value) > 100:
-                value = value[0:100] + "..."
-
-        outputs.append([html.B(text), html.Br(), value])
+        outputs.append([html.B(text), html.Br(), info[key]])
 
     return outputs
 
@@ -864,107 +1280,35 @@ def update_glacier_info_div(input_value):
 def update_glacier_figures(satellite_clickdata):
     """ Update time series figures of mass balance, length, area, and thickness change """
 
-    if satellite_clickdata is None:
-        satellite_clickdata = {
-            "points": [{"customdata": ["Mer de Glace", mer_de_glace]}]
-        }
+    selected = selected_glacier(satellite_clickdata)
+
+    if figure_bundle is not None:
+        figures = figure_bundle.get(selected)
+        if figures is not None:
+            return figures
 
-    selected = satellite_clickdata["points"][0]["customdata"][1]
+    if shared_cache is not None:
+        figures = shared_cache.get("glacier_figures", selected)
+        if figures is not None:
+            return figures
 
-    df_t = df_thickness.query("WGMS_ID == @selected").drop("WGMS_ID", axis=1)
-    df_mb = df_massbalance.query("WGMS_ID == @selected").drop("WGMS_ID", axis=1)
-    df_l = df_length.query("WGMS_ID == @selected").drop("WGMS_ID", axis=1)
-    df_a = df_area.query("WGMS_ID == @selected").drop("WGMS_ID", axis=1)
+    with callback_metrics.phase("lookup"):
+        df_t = thickness_index.get(selected)
+        df_mb = massbalance_index.get(selected)
+        df_l = length_index.get(selected)
+        df_a = area_index.get(selected)
 
     # df_t = ts_extend_helper(df_t)
     # df_mb = ts_extend_helper(df_mb)
     # df_l = ts_extend_helper(df_l)
     # df_a = ts_extend_helper(df_a)
 
-    thickness_fig = massbalance_fig = length_fig = area_fig = no_data_fig
+    with callback_metrics.phase("figure"):
+        figures = glacier_figures(df_t, df_mb, df_l, df_a)
+    if shared_cache is not None:
+        shared_cache.put("glacier_figures", selected, figures)
 
-    if not df_t.empty:
-        traces = []
-
-        for _, row in df_t.iterrows():
-            x = [row["REFERENCE_DATE"], row["YEAR"]]
-            y = [row["THICKNESS_CHG"], row["THICKNESS_CHG"]]
-            trace = dict(type="scatter", x=x, y=y, width=1, showlegend=False)
-            traces.append(trace)
-
-        thickness_fig = dict(
-            data=traces,
-            layout=dict(
-                autosize=True,
-                height=200,
-                margin=dict(l=45, r=20, b=20, t=20, pad=1),
-                yaxis=dict(tickformat=".0f"),
-            ),
-        )
-
-    if not df_mb.empty:
-        massbalance_fig = dict(
-            data=[
-                dict(
-                    type="bar",
-                    x=df_mb.YEAR,
-                    y=df_mb.ANNUAL_BALANCE,
-                    width=1,
-                    marker=dict(opacity=0.3,),
-                )
-            ],
-            layout=dict(
-                autosize=True,
-                height=200,
-                xaxis=dict(tickformat=".0f"),
-                margin=dict(l=40, r=20, b=20, t=20, pad=1),
-            ),
-        )
-
-    if not df_l.empty:
-        length_fig = dict(
-            data=[
-                dict(
-                    type="scatter",
-                    orientation="h",
-                    x=df_l.YEAR,
-                    y=df_l.LENGTH,
-                    width=1,
-                    marker=dict(size=12, opacity=0.3,),
-                    line=dict(dash="dot"),
-                )
-            ],
-            layout=dict(
-                mode="lines+markers",
-                autosize=True,
-                height=200,
-                margin=dict(l=50, r=20, b=20, t=20, pad=1),
-                yaxis=dict(tickformat=".0f", rangemode="tozero"),
-            ),
-        )
-
-    if not df_a.empty:
-        area_fig = dict(
-            data=[
-                dict(
-                    type="scatter",
-                    x=df_a.YEAR,
-                    y=df_a.AREA,
-                    width=1,
-                    fill="tonexty",
-                    marker=dict(color="rgb(158,202,225)", opacity=1,),
-                    line=dict(color="rgb(158,202,225)"),
-                )
-            ],
-            layout=dict(
-                autosize=True,
-                height=200,
-                margin=dict(l=40, r=20, b=20, t=20, pad=1),
-                xaxis=dict(tickformat=".0f"),
-            ),
-        )
-
-    return thickness_fig, massbalance_fig, length_fig, area_fig
+    return figures
 
 
 @app.callback(
@@ -978,5 +1322,11 @@ def toggle_modal(n2, is_open):
     return False
 
 
+if lazy_startup:
+    application.before_request(load_datasets)
+else:
+    load_datasets()
+
+
 if __name__ == "__main__":
     application.run()
@@ -0,0 +1,147 @@
+// Satellite map drawn in the browser from the marker table sent once per
+// dataset version (WGMS_COMPACT_MAP=1 in application.py), and filtered in the
+// browser too with WGMS_CLIENT_FILTERING=1
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    wgms: {
+        // Ask the server for the marker table unless local storage holds the
+        // current version
+        marker_table_request: function(timestamp, version, table) {
+            if (table && table.version === version) {
+                return window.dash_clientside.no_update;
+            }
+            return version;
+        },
+
+        // Row positions of a {"rows": [...]} or {"bitmap": base64} payload
+        decode_rows: function(payload) {
+            if (payload.rows) {
+                return payload.rows;
+            }
+            var bytes = atob(payload.bitmap);
+            var rows = [];
+            for (var i = 0; i < bytes.length; i++) {
+                var byte = bytes.charCodeAt(i);
+                for (var bit = 0; bit < 8; bit++) {
+                    if (byte & (128 >> bit)) {
+                        rows.push(8 * i + bit);
+                    }
+                }
+            }
+            return rows;
+        },
+
+        figure: function(rows, table) {
+            var lon = new Array(rows.length);
+            var lat = new Array(rows.length);
+            var customdata = new Array(rows.length);
+            for (var i = 0; i < rows.length; i++) {
+                var row = rows[i];
+                lon[i] = table.lon[row];
+                lat[i] = table.lat[row];
+                customdata[i] = [table.name[row], table.wgms_id[row]];
+            }
+            var trace = Object.assign({}, table.trace, {
+                lon: lon,
+                lat: lat,
+                customdata: customdata
+            });
+            return {data: [trace], layout: table.layout};
+        },
+
+        satellite_map: function(payload, table) {
+            if (!payload || !table) {
+                return window.dash_clientside.no_update;
+            }
+            var wgms = window.dash_clientside.wgms;
+            return wgms.figure(wgms.decode_rows(payload), table);
+        },
+
+        // Rows matching the selection filters, as GlacierFilterIndex.mask
+        filter_rows: function(filters, first_meas, years_data, categories, flags) {
+            var rows = [];
+            var n = filters.FIRST_MEAS.length;
+            for (var row = 0; row < n; row++) {
+                if (filters.FIRST_MEAS[row] > first_meas ||
+                        filters.YEAR_MEASUREMENTS[row] < years_data) {
+                    continue;
+                }
+                var match = true;
+                for (var column in categories) {
+                    if (!categories[column][filters[column][row]]) {
+                        match = false;
+                        break;
+                    }
+                }
+                if (match && (filters.FLAGS[row] & flags) === flags) {
+                    rows.push(row);
+                }
+            }
+            return rows;
+        },
+
+        // Map and info boxes of update_satellite_map, computed in the browser
+        filter_map: function(first_meas, years_data, prim_classific, form,
+                             frontal_chars, checkbox_mb, checkbox_length,
+                             checkbox_tc, checkbox_area, table) {
+            if (!table || !table.filters) {
+                return window.dash_clientside.no_update;
+            }
+
+            // An empty dropdown selects all codes 0 to 10
+            var categories = {};
+            var dropdowns = {
+                PRIM_CLASSIFIC: prim_classific,
+                FORM: form,
+                FRONTAL_CHARS: frontal_chars
+            };
+            for (var column in dropdowns) {
+                var selected = dropdowns[column];
+                if (!selected || !selected.length) {
+                    selected = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10];
+                }
+                categories[column] = {};
+                selected.forEach(function(code) {
+                    categories[column][code] = true;
+                });
+            }
+
+            // Bits of the required time series flags, in the order of
+            // GlacierFilterIndex.flag_columns
+            var flags = 0;
+            [checkbox_mb, checkbox_length, checkbox_tc, checkbox_area].forEach(
+                function(checkbox, bit) {
+                    if (checkbox && checkbox.length === 1 && checkbox[0] === 1) {
+                        flags |= 1 << bit;
+                    }
+                }
+            );
+
+            var filters = table.filters;
+            var wgms = window.dash_clientside.wgms;
+            var rows = wgms.filter_rows(filters, first_meas, years_data, categories, flags);
+
+            var earliest = Infinity;
+            var countries = {};
+            var num_countries = 0;
+            var num_data_points = 0;
+            rows.forEach(function(row) {
+                earliest = Math.min(earliest, filters.FIRST_MEAS[row]);
+                var unit = filters.POLITICAL_UNIT[row];
+                if (unit >= 0 && !countries[unit]) {
+                    countries[unit] = true;
+                    num_countries++;
+                }
+                num_data_points += filters.NUM_DATA_POINTS[row];
+            });
+
+            return [
+                wgms.figure(rows, table),
+                rows.length.toLocaleString("en-US"),
+                rows.length ? earliest.toFixed(0) : "N/A",
+                num_countries,
+                num_data_points.toLocaleString("en-US")
+            ];
+        }
+    }
+});
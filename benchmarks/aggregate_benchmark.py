@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""Compare ingest.ts_median against the groupby().median() ts_helper it replaced
+
+The four time series of data_import.py (thickness change, mass balance, length
+and area) are aggregated from synthetic D, EE and B tables, once with the
+previous pandas implementation and once with ts_median. Run from the
+repository root:
+
+    python -m benchmarks.aggregate_benchmark --scale 10
+"""
+
+import argparse
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import (
+    raw_change_table,
+    raw_massbalance_table,
+    raw_state_table,
+)
+from ingest import parse_reference_year, ts_median
+
+
+def groupby_median(df, columns):
+    """Previous ts_helper, kept as the baseline"""
+
+    return df.loc[:, columns].groupby(columns[0:2], as_index=False).median()
+
+
+def apply_reference_year(values):
+    """Previous REFERENCE_DATE conversion, kept as the baseline"""
+
+    return values.apply(lambda x: int(str(x)[0:4]))
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=float, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    th_columns = ["WGMS_ID", "YEAR", "THICKNESS_CHG", "REFERENCE_DATE"]
+    df_D = raw_change_table(args.scale, args.seed, text=False)
+    df_D = df_D.loc[:, th_columns].dropna()
+    df_EE = raw_massbalance_table(args.scale, args.seed, text=False)
+    df_EE = df_EE.dropna(subset=["ANNUAL_BALANCE"])
+    df_B = raw_state_table(args.scale, args.seed, text=False)
+    print(f"{len(df_D.index) + len(df_EE.index) + len(df_B.index)} rows")
+
+    expected_years, ms = timed(apply_reference_year, df_D["REFERENCE_DATE"])
+    print(f"REFERENCE_DATE apply      {ms:9.1f} ms")
+    years, ms = timed(parse_reference_year, df_D["REFERENCE_DATE"])
+    print(f"REFERENCE_DATE vectorized {ms:9.1f} ms")
+    pd.testing.assert_series_equal(years, expected_years)
+    df_D["REFERENCE_DATE"] = years
+
+    jobs = [
+        (df_D, th_columns),
+        (df_EE, ["WGMS_ID", "YEAR", "ANNUAL_BALANCE"]),
+        (df_B, ["WGMS_ID", "YEAR", "LENGTH"]),
+        (df_B, ["WGMS_ID", "YEAR", "AREA"]),
+    ]
+
+    expected, ms = timed(lambda: [groupby_median(df, columns) for df, columns in jobs])
+    print(f"groupby median            {ms:9.1f} ms")
+    result, ms = timed(lambda: [ts_median(df, columns) for df, columns in jobs])
+    print(f"ts_median                 {ms:9.1f} ms")
+    for df, df_expected in zip(result, expected):
+        pd.testing.assert_frame_equal(df, df_expected, check_exact=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""Latency, allocation and memory suite for the dashboard callbacks
+
+For each scale a fresh interpreter imports application.py against a synthetic
+catalog of that many times the 2019 release and replays filter inputs and map
+clicks through glacier_filter_helper, num_data_points_helper,
+update_satellite_map, update_glacier_info_div and update_glacier_figures. It
+reports p50 / p99 latency, the memory allocated per call (traced by
+tracemalloc), the RSS after startup and the peak RSS while replaying. Run from
+the repository root:
+
+    python -m benchmarks.callback_suite --scales 1 10 100 --output results.json
+
+Inputs are generated from --seed unless a file written with --record is given
+with --inputs, e.g. one recorded from production traffic. With --baseline the
+results are compared against an earlier --output and the suite fails when a
+p50 or p99 latency grew by more than --tolerance.
+"""
+
+import argparse
+import ctypes
+import gc
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from benchmarks.info_benchmark import click_stream
+from benchmarks.synthetic import (
+    load_application,
+    random_filter_inputs,
+    synthetic_catalog,
+)
+
+
+def generate_inputs(seed, num_requests, num_clicks, wgms_ids):
+    """Filter inputs as random_filter_inputs and Zipf distributed map clicks"""
+
+    rng = np.random.default_rng(seed)
+    clicks = click_stream(rng, wgms_ids, num_clicks)
+    return dict(
+        filters=random_filter_inputs(rng, num_requests),
+        clicks=[click["points"][0]["customdata"][1] for (click,) in clicks],
+    )
+
+
+def clear_caches(app):
+    app.satellite_map_cache.cache_clear()
+    app.info_cache.cache_clear()
+
+
+def calls(app, inputs):
+    """{target: list of zero-argument calls} replaying `inputs`"""
+
+    filters = [tuple(f) for f in inputs["filters"]]
+    clicks = [
+        {"points": [{"customdata": ["", wgms_id]}]} for wgms_id in inputs["clicks"]
+    ]
+    # Only the column num_data_points_helper reads, so the filtered frames held
+    # here do not dominate the peak memory
+    df_points = app.df_combined.loc[:, ["NUM_DATA_POINTS"]]
+    filtered = [
+        df_points.loc[app.glacier_filter_helper(app.df_combined, *f).index]
+        for f in filters
+    ]
+    return dict(
+        glacier_filter_helper=[
+            lambda f=f: app.glacier_filter_helper(app.df_combined, *f) for f in filters
+        ],
+        num_data_points_helper=[
+            lambda df=df: app.num_data_points_helper(df) for df in filtered
+        ],
+        update_satellite_map=[
+            lambda f=f: app.update_satellite_map(*f) for f in filters
+        ],
+        update_glacier_info_div=[
+            lambda c=c: app.update_glacier_info_div(c) for c in clicks
+        ],
+        update_glacier_figures=[
+            lambda c=c: app.update_glacier_figures(c) for c in clicks
+        ],
+    )
+
+
+def _memory(key):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(key + ":"):
+                return int(line.split()[1]) / 1024
+
+
+def run_scale(scale, seed, inputs, warm, traced_calls):
+    """Results of every target at one scale, in this process"""
+
+    start = time.perf_counter()
+    app = load_application(scale, seed)
+    startup_s = time.perf_counter() - start
+
+    # Drop what generating the catalog left behind and reset the high water
+    # mark, so the peak is that of the replay
+    gc.collect()
+    ctypes.CDLL("libc.so.6").malloc_trim(0)
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+
+    results = dict(
+        scale=scale,
+        glaciers=len(app.df_combined.index),
+        startup_s=startup_s,
+        rss_after_startup_mb=_memory("VmRSS"),
+        targets={},
+    )
+    if inputs is None:
+        inputs = generate_inputs(seed, 200, 500, app.df_combined["WGMS_ID"].to_numpy())
+    else:
+        # Recorded clicks may name glaciers a smaller synthetic catalog lacks
+        ids = app.glacier_positions
+        inputs = dict(inputs, clicks=[c for c in inputs["clicks"] if c in ids])
+
+    for name, target_calls in calls(app, inputs).items():
+        timings = []
+        for call in target_calls:
+            if not warm:
+                clear_caches(app)
+            start = time.perf_counter()
+            call()
+            timings.append((time.perf_counter() - start) * 1000)
+
+        # Allocations are traced on a sample, tracing slows calls down
+        allocated = []
+        for call in target_calls[:traced_calls]:
+            if not warm:
+                clear_caches(app)
+            tracemalloc.start()
+            before = tracemalloc.get_traced_memory()[0]
+            call()
+            allocated.append((tracemalloc.get_traced_memory()[1] - before) / 1024)
+            tracemalloc.stop()
+
+        p50, p99 = np.percentile(timings, [50, 99])
+        results["targets"][name] = dict(
+            calls=len(timings),
+            p50_ms=p50,
+            p99_ms=p99,
+            allocated_kb_p50=float(np.median(allocated)),
+            allocated_kb_max=float(np.max(allocated)),
+        )
+
+    results["peak_rss_mb"] = _memory("VmHWM")
+    return results
+
+
+def run_in_subprocess(args, scale):
+    """run_scale in a fresh interpreter, so each scale has its own peak memory"""
+
+    command = [sys.executable, "-m", "benchmarks.callback_suite", "--worker"]
+    command += ["--scales", str(scale), "--seed", str(args.seed)]
+    command += ["--traced-calls", str(args.traced_calls)]
+    if args.inputs:
+        command += ["--inputs", args.inputs]
+    if args.warm:
+        command.append("--warm")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run(
+        command, cwd=root, stdout=subprocess.PIPE, universal_newlines=True, check=True,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def print_results(results):
+    print(
+        f"{results['glaciers']:,} glaciers ({results['scale']:g}x): startup "
+        f"{results['startup_s']:.1f} s, RSS {results['rss_after_startup_mb']:.0f} MB "
+        f"after startup, peak {results['peak_rss_mb']:.0f} MB while replaying"
+    )
+    for name, r in results["targets"].items():
+        print(
+            f"  {name:<24} p50 {r['p50_ms']:8.3f} ms   p99 {r['p99_ms']:8.3f} ms   "
+            f"allocated p50 {r['allocated_kb_p50']:9.1f} KB   max {r['allocated_kb_max']:9.1f} KB"
+        )
+
+
+def regressions(results, baseline, tolerance):
+    """Lines describing latencies more than `tolerance` above `baseline`"""
+
+    found = []
+    previous = {r["scale"]: r for r in baseline}
+    for r in results:
+        if r["scale"] not in previous:
+            continue
+        for name, target in r["targets"].items():
+            old = previous[r["scale"]]["targets"].get(name)
+            for key in ["p50_ms", "p99_ms"] if old else []:
+                if target[key] > old[key] * (1 + tolerance):
+                    found.append(
+                        f"{r['scale']:g}x {name} {key} {old[key]:.3f} -> {target[key]:.3f}"
+                    )
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", type=float, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--inputs", help="JSON file of recorded inputs")
+    parser.add_argument("--record", help="write the generated inputs to this file")
+    parser.add_argument("--warm", action="store_true", help="keep callback caches")
+    parser.add_argument("--traced-calls", type=int, default=50)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="results of an earlier --output")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    inputs = None
+    if args.inputs:
+        with open(args.inputs) as f:
+            inputs = json.load(f)
+
+    if args.worker:
+        results = run_scale(
+            args.scales[0], args.seed, inputs, args.warm, args.traced_calls
+        )
+        print(json.dumps(results))
+        return
+
+    if args.record:
+        wgms_ids = synthetic_catalog(1, args.seed)[0]["WGMS_ID"].to_numpy()
+        with open(args.record, "w") as f:
+            json.dump(generate_inputs(args.seed, 200, 500, wgms_ids), f)
+        print(f"Inputs written to {args.record}")
+        args.inputs = args.record
+
+    all_results = []
+    for scale in args.scales:
+        results = run_in_subprocess(args, scale)
+        print_results(results)
+        all_results.append(results)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(all_results, f, indent=1)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(all_results, json.load(f), args.tolerance)
+        for line in found:
+            print(f"Regression: {line}")
+        if found:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
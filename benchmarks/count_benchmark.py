@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""Check and time num_data_points_helper against the isin() scans it replaced
+
+Run from the repository root:
+
+    python -m benchmarks.count_benchmark --scale 1 --requests 200
+"""
+
+import argparse
+
+import numpy as np
+
+from benchmarks.filter_benchmark import report, time_requests
+from benchmarks.synthetic import load_application, random_filter_inputs
+
+
+def isin_count(app, unique_ids):
+    """Previous num_data_points_helper implementation, kept as the baseline"""
+
+    dfs = [app.df_thickness, app.df_massbalance, app.df_length, app.df_area]
+    return sum([df[df["WGMS_ID"].isin(unique_ids)].iloc[:, 0].count() for df in dfs])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=float, default=1)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    app = load_application(args.scale, args.seed)
+    rng = np.random.default_rng(args.seed)
+    filtered = [
+        (app.glacier_filter_helper(app.df_combined, *inputs),)
+        for inputs in random_filter_inputs(rng, args.requests)
+    ]
+
+    for (df,) in filtered:
+        expected = isin_count(app, df["WGMS_ID"].unique())
+        assert app.num_data_points_helper(df) == expected
+
+    print(f"{len(filtered)} random filter combinations match")
+    report(
+        "isin",
+        time_requests(lambda df: isin_count(app, df["WGMS_ID"].unique()), filtered),
+    )
+    report("masked sum", time_requests(app.num_data_points_helper, filtered))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""Compare GlacierFilterIndex against the DataFrame.query() chain it replaced
+
+tests/test_filter_index.py checks that both select the same glaciers. Run from the repository root:
+
+    python -m benchmarks.filter_benchmark --scale 1 --requests 500
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import random_filter_inputs, synthetic_catalog
+from glacier_index import GlacierFilterIndex
+from storage import enforce_schema
+
+
+def query_chain_filter(
+    df,
+    first_meas,
+    years_data,
+    prim_classific,
+    form,
+    frontal_chars,
+    checkbox_mb,
+    checkbox_length,
+    checkbox_tc,
+    checkbox_area,
+):
+    """Previous glacier_filter_helper implementation, kept as the baseline"""
+
+    dropdown_all = list(range(11))
+    if not prim_classific:
+        prim_classific = dropdown_all
+    if not form:
+        form = dropdown_all
+    if not frontal_chars:
+        frontal_chars = dropdown_all
+
+    checkbox_mb = [True] if checkbox_mb == [1] else [True, False]
+    checkbox_length = [True] if checkbox_length == [1] else [True, False]
+    checkbox_tc = [True] if checkbox_tc == [1] else [True, False]
+    checkbox_area = [True] if checkbox_area == [1] else [True, False]
+
+    return (
+        df.query("FIRST_MEAS <= @first_meas")
+        .query("YEAR_MEASUREMENTS >= @years_data")
+        .query("PRIM_CLASSIFIC in @prim_classific")
+        .query("FORM in @form")
+        .query("FRONTAL_CHARS in @frontal_chars")
+        .query("THICKNESS_CHANGE_TS in @checkbox_tc")
+        .query("LENGTH_TS in @checkbox_length")
+        .query("AREA_TS in @checkbox_area")
+        .query("MASS_BALANCE_TS in @checkbox_mb")
+    )
+
+
+def time_requests(func, requests):
+    """Per-request wall times in milliseconds"""
+
+    timings = []
+    for inputs in requests:
+        start = time.perf_counter()
+        func(*inputs)
+        timings.append((time.perf_counter() - start) * 1000)
+    return np.array(timings)
+
+
+def report(name, timings):
+    p50, p99 = np.percentile(timings, [50, 99])
+    print(
+        f"{name:<12} p50 {p50:8.3f} ms   p99 {p99:8.3f} ms   total {timings.sum():9.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=float, default=1)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    df = enforce_schema(synthetic_catalog(args.scale, args.seed)[0])[0]
+    requests = random_filter_inputs(np.random.default_rng(args.seed), args.requests)
+
+    start = time.perf_counter()
+    index = GlacierFilterIndex(df)
+    build_ms = (time.perf_counter() - start) * 1000
+    print(f"{len(df.index):,} glaciers, index built in {build_ms:.1f} ms")
+
+    report(
+        "query chain", time_requests(lambda *x: query_chain_filter(df, *x), requests)
+    )
+    report("bitmap mask", time_requests(index.mask, requests))
+    report("bitmap rows", time_requests(lambda *x: df[index.mask(*x)], requests))
+
+
+if __name__ == "__main__":
+    main()
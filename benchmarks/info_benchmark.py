@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""Replay a click stream against update_glacier_info_div
+
+Clicks follow a Zipf distribution over glaciers, so a few well known glaciers
+are selected far more often than the rest. The stream is replayed through the
+previous scan-based lookup and the current callback. Run from the repository
+root:
+
+    python -m benchmarks.info_benchmark --scale 1 --clicks 2000
+"""
+
+import argparse
+
+import numpy as np
+
+from benchmarks.filter_benchmark import report, time_requests
+from benchmarks.synthetic import load_application
+
+
+def scan_info(app, wgms_id):
+    """Previous update_glacier_info_div lookup, kept as the baseline"""
+
+    df = app.df_combined[app.df_combined["WGMS_ID"] == wgms_id].reset_index()
+    details = app.glacier_details(wgms_id)
+
+    he = df.at[0, "HIGHEST_ELEVATION"]
+    le = df.at[0, "LOWEST_ELEVATION"]
+    highest_elev = f"{he:.0f}" if not np.isnan(he) else "N/A"
+    lowest_elev = f"{le:.0f}" if not np.isnan(le) else "N/A"
+
+    reference = details["REFERENCE"]
+    if len(reference) > 100:
+        reference = reference[0:100] + "..."
+
+    return dict(
+        NAME=df.at[0, "NAME"],
+        WGMS_ID=df.at[0, "WGMS_ID"],
+        SPEC_LOCATION=details["SPEC_LOCATION"],
+        POLITICAL_UNIT=df.at[0, "POLITICAL_UNIT"],
+        ELEVATION=f"{lowest_elev} to {highest_elev}",
+        LAT_LONG=f"{df.at[0,'LATITUDE']:.2f}, {df.at[0,'LONGITUDE']:.2f}",
+        REFERENCE=reference,
+        SPONS_AGENCY=details["SPONS_AGENCY"],
+        REMARKS=details["REMARKS"],
+    )
+
+
+def click_stream(rng, wgms_ids, num_clicks, zipf_a=1.3):
+    """Map clicks with Zipf distributed glacier popularity"""
+
+    popularity = rng.permutation(wgms_ids)
+    ranks = np.minimum(rng.zipf(zipf_a, size=num_clicks), len(popularity)) - 1
+    return [
+        ({"points": [{"customdata": ["", int(popularity[rank])]}]},) for rank in ranks
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=float, default=1)
+    parser.add_argument("--clicks", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    app = load_application(args.scale, args.seed)
+    rng = np.random.default_rng(args.seed)
+    clicks = click_stream(rng, app.df_combined["WGMS_ID"].to_numpy(), args.clicks)
+
+    for (click,) in clicks[:100]:
+        wgms_id = click["points"][0]["customdata"][1]
+        expected = scan_info(app, wgms_id)
+        actual = app.glacier_info_helper(wgms_id)
+        assert all(expected[key] == actual[key] for key in expected), wgms_id
+
+    unique = len({click["points"][0]["customdata"][1] for (click,) in clicks})
+    print(f"{len(clicks)} clicks on {unique} distinct glaciers")
+
+    def scan_callback(click):
+        return scan_info(app, click["points"][0]["customdata"][1])
+
+    report("scan", time_requests(scan_callback, clicks))
+    app.info_cache.cache_clear()
+    report("index", time_requests(app.update_glacier_info_div, clicks))
+    print(app.info_cache.cache_info())
+
+
+if __name__ == "__main__":
+    main()
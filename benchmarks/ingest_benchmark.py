@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""Compare whole-file and streaming ingestion of the D and EE files
+
+Synthetic D-CHANGE and EE-MASS-BALANCE CSVs are aggregated to per-(WGMS_ID,
+YEAR) medians by reading each file whole, as data_import.py does by default,
+and with ingest.stream_ts_median. Each run happens in a fresh interpreter so
+its peak memory can be reported. Run from the repository root:
+
+    python -m benchmarks.ingest_benchmark --scale 10 --chunksize 100000
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+import pandas as pd
+
+from benchmarks.synthetic import raw_change_table, raw_massbalance_table
+from ingest import stream_ts_median
+
+
+th_columns = ["WGMS_ID", "YEAR", "THICKNESS_CHG", "REFERENCE_DATE"]
+ee_columns = ["WGMS_ID", "YEAR", "ANNUAL_BALANCE"]
+
+
+def reference_year(df):
+    df["REFERENCE_DATE"] = df["REFERENCE_DATE"].apply(lambda x: int(str(x)[0:4]))
+    return df
+
+
+def whole_file_median(path, columns, dropna, transform=None):
+    """Previous data_import.py ingestion, kept as the baseline"""
+
+    df = pd.read_csv(path)
+    df = df.loc[:, columns].dropna(subset=dropna)
+    if transform is not None:
+        df = transform(df)
+    return df.groupby(columns[0:2], as_index=False).median()
+
+
+run_script = """
+import sys, time
+sys.path.insert(0, {root!r})
+from benchmarks import ingest_benchmark as bench
+
+def memory(key):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(key + ":"):
+                return int(line.split()[1]) / 1024
+
+transform = bench.reference_year if {transform} else None
+before = memory("VmRSS")
+start = time.perf_counter()
+if {chunksize}:
+    bench.stream_ts_median({path!r}, {columns!r}, {chunksize}, {dropna!r}, transform)
+else:
+    bench.whole_file_median({path!r}, {columns!r}, {dropna!r}, transform)
+elapsed = time.perf_counter() - start
+print(elapsed * 1000, memory("VmHWM") - before)
+"""
+
+
+def run(path, columns, dropna, transform, chunksize):
+    """(ms, peak MB above the interpreter baseline) of one ingestion in a fresh interpreter"""
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    script = run_script.format(
+        root=root,
+        path=path,
+        columns=columns,
+        dropna=dropna,
+        transform=transform,
+        chunksize=chunksize,
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", script],
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    ).stdout
+    return tuple(map(float, output.split()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=float, default=1)
+    parser.add_argument("--chunksize", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name, table, columns, dropna, transform in [
+            ("D-CHANGE", raw_change_table, th_columns, th_columns, True),
+            (
+                "EE-MASS-BALANCE",
+                raw_massbalance_table,
+                ee_columns,
+                ["ANNUAL_BALANCE"],
+                False,
+            ),
+        ]:
+            path = os.path.join(directory, f"{name}.csv")
+            table(args.scale, args.seed).to_csv(path, index=False)
+
+            transform_func = reference_year if transform else None
+            pd.testing.assert_frame_equal(
+                stream_ts_median(path, columns, args.chunksize, dropna, transform_func),
+                whole_file_median(path, columns, dropna, transform_func),
+            )
+
+            print(f"{name}: {os.path.getsize(path) / 2 ** 20:.1f} MB on disk")
+            for label, chunksize in [("whole file", 0), ("streaming", args.chunksize)]:
+                ms, peak = run(path, columns, dropna, transform, chunksize)
+                print(f"  {label:<10}  {ms:8.1f} ms   peak +{peak:7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""Compare ingest.join_glaciers against the merge chain it replaced
+
+The per-glacier tables of data_import.py's "Concatenate" section are built
+from synthetic catalogs and joined onto the A columns, once with seven
+successive merges and a replace pass, and once with join_glaciers, reporting
+time and peak memory of each. Run from the repository root:
+
+    python -m benchmarks.join_benchmark --glaciers 10000 100000 1000000
+"""
+
+import argparse
+import ctypes
+import os
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import a_derived_columns, base_num_glaciers, synthetic_catalog
+from ingest import join_glaciers
+from storage import enforce_schema
+
+
+defaults = {
+    "FIRST_MEAS": 2020,
+    "YEAR_MEASUREMENTS": 0,
+    "PRIM_CLASSIFIC": 10,
+    "FORM": 10,
+    "FRONTAL_CHARS": 10,
+    "SPEC_LOCATION": "N/A",
+    "NAME": "N/A",
+    "INVESTIGATOR": "N/A",
+    "SPONS_AGENCY": "N/A",
+    "REMARKS": "N/A",
+    "REFERENCE": "N/A",
+    "THICKNESS_CHANGE_TS": False,
+    "LENGTH_TS": False,
+    "AREA_TS": False,
+    "MASS_BALANCE_TS": False,
+}
+
+
+def merge_chain(df_compiled, tables):
+    """Previous "Concatenate" section, kept as the baseline"""
+
+    df_B_reduced, *tables = tables
+    df_compiled = df_compiled.merge(
+        df_B_reduced, how="left", on="WGMS_ID", validate="1:1"
+    )
+    for table in tables:
+        df_compiled = df_compiled.merge(table, on="WGMS_ID", how="left")
+    df_compiled.replace({c: {np.nan: v} for c, v in defaults.items()}, inplace=True)
+    return df_compiled
+
+
+def join_inputs(num_glaciers, seed):
+    """A columns and per-glacier tables as data_import.py builds them"""
+
+    df, *ts = synthetic_catalog(num_glaciers / base_num_glaciers, seed)
+    df_A = df.loc[:, [c for c in df.columns if c not in a_derived_columns]]
+
+    b_columns = ["WGMS_ID", "YEAR", "HIGHEST_ELEVATION", "LOWEST_ELEVATION"]
+    b_columns += ["INVESTIGATOR", "SPONS_AGENCY", "REFERENCE"]
+    df_B_reduced = df.loc[df["YEAR"].notna(), b_columns]
+
+    years = pd.concat([t.loc[:, ["WGMS_ID", "YEAR"]] for t in ts])
+    first_meas = years.groupby("WGMS_ID")["YEAR"].min().rename("FIRST_MEAS")
+    year_measurements = years.drop_duplicates().groupby("WGMS_ID").size()
+    year_measurements = year_measurements.rename("YEAR_MEASUREMENTS")
+
+    flags = ["THICKNESS_CHANGE_TS", "MASS_BALANCE_TS", "LENGTH_TS", "AREA_TS"]
+    ts_bools = [
+        pd.DataFrame({"WGMS_ID": t["WGMS_ID"].unique(), flag: True})
+        for t, flag in zip(ts, flags)
+    ]
+    # Same order as data_import.py: thickness, length, area, mass balance
+    ts_bools = [ts_bools[0], ts_bools[2], ts_bools[3], ts_bools[1]]
+
+    tables = [
+        df_B_reduced,
+        first_meas.reset_index(),
+        year_measurements.reset_index(),
+    ] + ts_bools
+    return df_A, tables
+
+
+def _memory(key):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(key + ":"):
+                return int(line.split()[1]) / 1024
+
+
+def measure(func, *args):
+    """(result, ms, peak MB above the starting RSS), run in a forked process
+
+    The child resets its high water mark before running `func`, and sends
+    the result back pickled.
+    """
+
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_end)
+        # Return freed heap to the system, so the run cannot reuse memory that
+        # is already resident, and reset the inherited high water mark
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        before = _memory("VmRSS")
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = (time.perf_counter() - start) * 1000
+        peak = _memory("VmHWM") - before
+        with os.fdopen(write_end, "wb") as f:
+            pickle.dump((result, elapsed, peak), f, pickle.HIGHEST_PROTOCOL)
+        os._exit(0)
+
+    os.close(write_end)
+    with os.fdopen(read_end, "rb") as f:
+        result = pickle.load(f)
+    os.waitpid(pid, 0)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--glaciers", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for num_glaciers in args.glaciers:
+        df_A, tables = join_inputs(num_glaciers, args.seed)
+        print(f"{num_glaciers} glaciers")
+
+        expected, ms, peak = measure(merge_chain, df_A, tables)
+        print(f"  merge chain    {ms:9.1f} ms   peak {peak:8.1f} MB")
+        result, ms, peak = measure(join_glaciers, df_A, tables, defaults)
+        print(f"  join_glaciers  {ms:9.1f} ms   peak {peak:8.1f} MB")
+
+        pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+        for df, df_expected in zip(enforce_schema(result), enforce_schema(expected)):
+            pd.testing.assert_frame_equal(df, df_expected)
+
+
+if __name__ == "__main__":
+    main()
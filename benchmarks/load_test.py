@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+"""Load test a local gunicorn server with replayed Dash callback traffic
+
+A synthetic catalog is written to a temporary directory and served by gunicorn
+with each of the requested worker counts. Simulated users then replay what the
+browser sends to /_dash-update-component: slider drags, one request per step
+of the slider, dropdown and checkbox changes, and map clicks on random
+glaciers, each of which updates the info panel and the figures. For every
+concurrency level it reports throughput, latency percentiles and the error
+rate per callback. Run from the repository root:
+
+    python -m benchmarks.load_test --workers 1 2 4 --concurrency 1 8 32 --duration 20
+"""
+
+import argparse
+import http.client
+import json
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import random_filter_inputs, synthetic_catalog, write_catalog
+
+
+filter_ids = [
+    "first_measurement_slider",
+    "years_data_slider",
+    "prim_classific_dropdown",
+    "form_dropdown",
+    "frontal_chars_dropdown",
+    "checkbox_mb",
+    "checkbox_length",
+    "checkbox_tc",
+    "checkbox_area",
+]
+
+
+def _outputs(spec):
+    """Outputs field of a request for the dependency output `spec`"""
+
+    def output(s):
+        component_id, prop = s.rsplit(".", 1)
+        return {"id": component_id, "property": prop}
+
+    if spec.startswith(".."):
+        return [output(s) for s in spec[2:-2].split("...")]
+    return output(spec)
+
+
+def initial_values(layout, values=None):
+    """{"id.property": value} of the components in a /_dash-layout response"""
+
+    if values is None:
+        values = {}
+    if isinstance(layout, list):
+        for child in layout:
+            initial_values(child, values)
+    elif isinstance(layout, dict) and "props" in layout:
+        props = layout["props"]
+        for prop, value in props.items():
+            if "id" in props:
+                values[f"{props['id']}.{prop}"] = value
+            initial_values(value, values)
+    return values
+
+
+class Callbacks:
+    """Request bodies for the callbacks of a running server
+
+    `dependencies` and `layout` are the responses of /_dash-dependencies and
+    /_dash-layout.
+    """
+
+    def __init__(self, dependencies, layout):
+        self.initial_values = initial_values(layout)
+        self.dependencies = {}
+        for dependency in dependencies:
+            if dependency.get("clientside_function"):
+                continue
+            for item in dependency["inputs"]:
+                key = f"{item['id']}.{item['property']}"
+                self.dependencies.setdefault(key, []).append(dependency)
+
+    def bodies(self, changed, values):
+        """(name, body) of the server callbacks triggered by changing `changed`
+
+        `changed` is an "id.property" key and `values` are the current
+        {"id.property": value} of the page. Callbacks are named after the
+        component of their first output.
+        """
+
+        bodies = []
+        for dependency in self.dependencies.get(changed, []):
+            outputs = _outputs(dependency["output"])
+            name = (outputs[0] if isinstance(outputs, list) else outputs)["id"]
+            bodies.append(
+                (
+                    name,
+                    json.dumps(
+                        {
+                            "output": dependency["output"],
+                            "outputs": outputs,
+                            "inputs": [
+                                dict(
+                                    item,
+                                    value=values.get(
+                                        f"{item['id']}.{item['property']}"
+                                    ),
+                                )
+                                for item in dependency["inputs"]
+                            ],
+                            "changedPropIds": [changed],
+                            "state": [
+                                dict(
+                                    item,
+                                    value=values.get(
+                                        f"{item['id']}.{item['property']}"
+                                    ),
+                                )
+                                for item in dependency.get("state", [])
+                            ],
+                        }
+                    ),
+                )
+            )
+        return bodies
+
+
+def session(rng, wgms_ids, num_actions=20):
+    """One user's interactions as a list of ("id.property", value) changes"""
+
+    changes = []
+    for _ in range(num_actions):
+        action = rng.choice(["drag", "filter", "click", "click"])
+        if action == "drag":
+            # Sliders send a request for each step they pass while dragged
+            slider, start, stop = [
+                ("first_measurement_slider", 2020, int(rng.integers(1850, 2020))),
+                ("years_data_slider", 0, int(rng.integers(1, 21))),
+            ][rng.integers(2)]
+            step = -1 if stop < start else 1
+            steps = np.arange(start + step, stop + step, step)
+            for value in steps[:: max(len(steps) // 10, 1)]:
+                changes.append((f"{slider}.value", int(value)))
+        elif action == "filter":
+            inputs = random_filter_inputs(rng, 1)[0]
+            i = int(rng.integers(2, len(filter_ids)))
+            changes.append((f"{filter_ids[i]}.value", inputs[i]))
+        else:
+            wgms_id = int(rng.choice(wgms_ids))
+            click = {"points": [{"customdata": ["", wgms_id]}]}
+            changes.append(("mapbox.clickData", click))
+    return changes
+
+
+def sessions(seed, wgms_ids):
+    """Endless sessions of one user"""
+
+    rng = np.random.default_rng(seed)
+    while True:
+        yield session(rng, wgms_ids)
+
+
+class Results:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.lock = threading.Lock()
+
+    def add(self, name, seconds, ok):
+        with self.lock:
+            self.latencies.setdefault(name, []).append(seconds * 1000)
+            self.errors[name] = self.errors.get(name, 0) + (not ok)
+
+
+def user(port, callbacks, sessions, stop, results):
+    """Replay sessions over one keep-alive connection until `stop` is set"""
+
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    headers = {"Content-Type": "application/json"}
+    for changes in sessions:
+        values = dict(callbacks.initial_values)
+        for changed, value in changes:
+            values[changed] = value
+            for name, body in callbacks.bodies(changed, values):
+                if stop.is_set():
+                    return
+                start = time.perf_counter()
+                try:
+                    connection.request("POST", "/_dash-update-component", body, headers)
+                    response = connection.getresponse()
+                    response.read()
+                    # 204 is a callback raising PreventUpdate
+                    ok = response.status in (200, 204)
+                except (OSError, http.client.HTTPException):
+                    ok = False
+                    connection.close()
+                    connection = http.client.HTTPConnection(
+                        "127.0.0.1", port, timeout=60
+                    )
+                results.add(name, time.perf_counter() - start, ok)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(data_dir, workers, threads, port, options=(), env=None):
+    """gunicorn serving application:application and its Callbacks, once it answers
+
+    `options` are further gunicorn arguments and `env` further environment
+    variables.
+    """
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, WGMS_DATA_DIR=data_dir, **(env or {}))
+    command = [sys.executable, "-m", "gunicorn", "application:application"]
+    command += ["--workers", str(workers), "--threads", str(threads)]
+    command += ["--bind", f"127.0.0.1:{port}", "--log-level", "warning"]
+    command += list(options)
+    server = subprocess.Popen(command, cwd=root, env=env)
+
+    deadline = time.time() + 300
+    while time.time() < deadline:
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            responses = []
+            for path in ["/_dash-dependencies", "/_dash-layout"]:
+                connection.request("GET", path)
+                response = connection.getresponse()
+                responses.append(json.loads(response.read()))
+            return server, Callbacks(*responses)
+        except (OSError, http.client.HTTPException, ValueError):
+            pass
+        if server.poll() is not None:
+            raise RuntimeError("gunicorn exited during startup")
+        time.sleep(0.5)
+    server.kill()
+    raise RuntimeError("gunicorn did not start")
+
+
+def report(results, seconds):
+    total = sum(len(v) for v in results.latencies.values())
+    errors = sum(results.errors.values())
+    print(
+        f"    {total / seconds:8.1f} requests/s   errors {errors}/{total} "
+        f"({100 * errors / max(total, 1):.2f}%)"
+    )
+    for name, latencies in sorted(results.latencies.items()):
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        print(
+            f"    {name:<17} {len(latencies):6d}   p50 {p50:8.1f} ms   p95 {p95:8.1f} ms"
+            f"   p99 {p99:8.1f} ms   max {max(latencies):8.1f} ms"
+            f"   errors {results.errors[name]}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=float, default=1)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2])
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--duration", type=float, default=20, help="seconds per run")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix="wgms_")
+    try:
+        tables = synthetic_catalog(args.scale, args.seed)
+        wgms_ids = tables[0]["WGMS_ID"].to_numpy()
+        write_catalog(data_dir, tables)
+        del tables
+
+        for workers in args.workers:
+            port = free_port()
+            server, callbacks = start_server(data_dir, workers, args.threads, port)
+            print(f"{workers} worker(s) x {args.threads} thread(s)")
+            try:
+                for concurrency in args.concurrency:
+                    stop = threading.Event()
+                    results = Results()
+                    threads = [
+                        threading.Thread(
+                            target=user,
+                            args=(
+                                port,
+                                callbacks,
+                                sessions([args.seed, i], wgms_ids),
+                                stop,
+                                results,
+                            ),
+                        )
+                        for i in range(concurrency)
+                    ]
+                    start = time.perf_counter()
+                    for thread in threads:
+                        thread.start()
+                    time.sleep(args.duration)
+                    stop.set()
+                    for thread in threads:
+                        thread.join()
+                    print(f"  {concurrency} concurrent user(s)")
+                    report(results, time.perf_counter() - start)
+            finally:
+                server.send_signal(signal.SIGTERM)
+                server.wait()
+    finally:
+        shutil.rmtree(data_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""Time per-glacier time series lookups: DataFrame.query() scans vs TimeSeriesIndex
+
+Run from the repository root:
+
+    python -m benchmarks.lookup_benchmark --scale 1 --clicks 500
+"""
+
+import argparse
+
+import numpy as np
+
+from benchmarks.filter_benchmark import report, time_requests
+from benchmarks.synthetic import synthetic_catalog
+from glacier_index import TimeSeriesIndex
+
+
+def query_lookup(tables, selected):
+    """Previous update_glacier_figures lookup, kept as the baseline"""
+
+    dfs = []
+    for df in tables:
+        dfs.append(df.query("WGMS_ID == @selected").drop("WGMS_ID", axis=1))
+    return dfs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=float, default=1)
+    parser.add_argument("--clicks", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    df_combined, *tables = synthetic_catalog(args.scale, args.seed)
+    indexes = [TimeSeriesIndex(df) for df in tables]
+
+    # Clicks land on any glacier, but favour those with thickness data
+    rng = np.random.default_rng(args.seed)
+    ids = np.where(
+        rng.random(args.clicks) < 0.5,
+        rng.choice(df_combined["WGMS_ID"], size=args.clicks),
+        rng.choice(tables[0]["WGMS_ID"], size=args.clicks),
+    )
+    clicks = [(int(wgms_id),) for wgms_id in ids]
+
+    for (selected,) in clicks[:50]:
+        for df, index in zip(query_lookup(tables, selected), indexes):
+            ts = index.get(selected)
+            for column in df.columns:
+                assert np.array_equal(df[column].to_numpy(), ts[column]), selected
+
+    print(f"{sum(len(df.index) for df in tables):,} time series rows")
+    report("query", time_requests(lambda s: query_lookup(tables, s), clicks))
+    report("index", time_requests(lambda s: [i.get(s) for i in indexes], clicks))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""Compare the satellite map payloads of the figure, clustered and compact modes
+
+update_satellite_map is called for random filter combinations, drawing every
+filtered glacier as before, with WGMS_MAP_CLUSTERING for a few map views, and
+with WGMS_COMPACT_MAP, reporting the build time and the size of the JSON sent
+to the browser. Run from the repository root:
+
+    python -m benchmarks.map_benchmark --scale 1 --requests 100
+"""
+
+import argparse
+import base64
+import json
+import os
+import time
+
+import numpy as np
+import plotly.graph_objects as go
+from plotly.utils import PlotlyJSONEncoder
+
+from benchmarks.spatial_benchmark import scan_view
+from benchmarks.synthetic import load_application, random_filter_inputs
+
+
+def relayout_data(zoom, lon, lat, width=1000, height=350):
+    """relayoutData of a mapbox view centred on (lon, lat), as plotly.js reports it"""
+
+    # The view spans width / (512 * 2**zoom) of the world's 360 degrees
+    half_lon = 180 * width / (512 * 2 ** zoom)
+    half_lat = min(180 * height / (512 * 2 ** zoom), 85)
+    west, east = lon - half_lon, lon + half_lon
+    south, north = max(lat - half_lat, -85), min(lat + half_lat, 85)
+    return {
+        "mapbox.center": {"lon": lon, "lat": lat},
+        "mapbox.zoom": zoom,
+        "mapbox._derived": {
+            "coordinates": [[west, north], [east, north], [east, south], [west, south]]
+        },
+    }
+
+
+views = {
+    "world, zoom 0": None,
+    "Europe, zoom 3": relayout_data(3, 10, 47),
+    "Alps, zoom 5": relayout_data(5, 9, 46),
+    "Alps, zoom 7": relayout_data(7, 9, 46),
+    "Pacific, zoom 4": relayout_data(4, 180, 0),
+}
+
+
+def check_counts(app, outputs, rows, view):
+    """Markers of a clustered map account for every filtered glacier in view"""
+
+    data = outputs[0]["data"]
+    in_view = scan_view(app.map_grid, rows, view)
+    shown = len(data[0]["lon"]) + sum(int(c) for t in data[1:] for c in t["text"])
+    assert shown == len(in_view), (shown, len(in_view))
+
+
+def previous_trace(df):
+    """Previous map trace, with unrounded coordinates and names sent twice"""
+
+    return dict(
+        type="scattermapbox",
+        lon=df["LONGITUDE"],
+        lat=df["LATITUDE"],
+        customdata=df.loc[:, ["NAME", "WGMS_ID"]].values,
+        tname=df["NAME"].values,
+        mode="markers",
+        marker=go.scattermapbox.Marker(size=8, opacity=0.7),
+        hovertemplate="<b>%{customdata[0]}</b><br>Lat: %{lat:.2f} <br>Lon: %{lon:.2f}<extra></extra>",
+    )
+
+
+def check_rows(app, outputs, rows):
+    """Compact payloads decode to the filtered rows"""
+
+    payload = outputs[0]
+    if "rows" in payload:
+        decoded = np.array(payload["rows"], dtype=int)
+    else:
+        bits = np.frombuffer(base64.b64decode(payload["bitmap"]), dtype=np.uint8)
+        decoded = np.flatnonzero(np.unpackbits(bits, count=len(app.df_combined.index)))
+    assert np.array_equal(decoded, rows)
+
+
+def measure(app, requests, view_data):
+    """(p50 ms, mean payload KB) of update_satellite_map over `requests`"""
+
+    timings, sizes = [], []
+    for inputs in requests:
+        app.satellite_map_cache.cache_clear()
+        start = time.perf_counter()
+        outputs = app.update_satellite_map(*inputs, view_data)
+        timings.append((time.perf_counter() - start) * 1000)
+        sizes.append(len(json.dumps(outputs[0], cls=PlotlyJSONEncoder)))
+    return np.median(timings), np.mean(sizes) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=float, default=1)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    os.environ["WGMS_MAP_CLUSTERING"] = "1"
+    app = load_application(args.scale, args.seed)
+    requests = random_filter_inputs(np.random.default_rng(args.seed), args.requests)
+    print(f"{len(app.df_combined.index):,} glaciers")
+
+    for inputs in requests[:20]:
+        rows = app.glacier_filter_helper(app.df_combined, *inputs).index.to_numpy()
+        for view_data in views.values():
+            app.satellite_map_cache.cache_clear()
+            outputs = app.update_satellite_map(*inputs, view_data)
+            check_counts(app, outputs, rows, app.map_view(view_data))
+
+    app.map_clustering = False
+    sizes = []
+    for inputs in requests:
+        df = app.glacier_filter_helper(app.df_combined, *inputs)
+        figure = dict(data=[previous_trace(df)], layout=app.map_layout())
+        sizes.append(len(json.dumps(figure, cls=PlotlyJSONEncoder)))
+    print(
+        f"{'previous figure':<16}                payload {np.mean(sizes) / 1024:8.1f} KB"
+    )
+    ms, kb = measure(app, requests, None)
+    print(f"{'every glacier':<16} p50 {ms:7.2f} ms   payload {kb:8.1f} KB")
+
+    app.compact_map = True
+    for inputs in requests[:20]:
+        rows = app.glacier_filter_helper(app.df_combined, *inputs).index.to_numpy()
+        app.satellite_map_cache.cache_clear()
+        check_rows(app, app.update_satellite_map(*inputs), rows)
+    ms, kb = measure(app, requests, None)
+    print(f"{'compact rows':<16} p50 {ms:7.2f} ms   payload {kb:8.1f} KB")
+    app.compact_map = False
+
+    app.map_clustering = True
+    for name, view_data in views.items():
+        ms, kb = measure(app, requests, view_data)
+        print(f"{name:<16} p50 {ms:7.2f} ms   payload {kb:8.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""Compare sequential and pooled parsing of the A, B, D and EE files
+
+Synthetic FoG CSVs are parsed with StageCache.run_many, once one file after
+another and once in a process pool, each time into an empty stage cache. The
+size of each result and the time to hand it from a worker to the parent are
+reported for the pickled DataFrame the pool uses and, for comparison, an Arrow
+IPC stream. Run from the repository root:
+
+    python -m benchmarks.parse_benchmark --scale 10 --processes 4
+"""
+
+import argparse
+import os
+import pickle
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import (
+    raw_change_table,
+    raw_glacier_table,
+    raw_massbalance_table,
+    raw_state_table,
+)
+from ingest import parse_A, parse_B, parse_D, parse_EE, reference_year
+from pipeline import StageCache
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+
+def to_arrow(df):
+    """DataFrame as an Arrow IPC stream"""
+
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    sink = pa.BufferOutputStream()
+    writer = pa.ipc.new_stream(sink, table.schema)
+    writer.write_table(table)
+    writer.close()
+    return sink.getvalue()
+
+
+def from_arrow(buffer):
+    return pa.ipc.open_stream(buffer).read_all().to_pandas()
+
+
+def handoff(df, encode, decode):
+    """(bytes, ms) to send `df` from a worker to the parent process"""
+
+    start = time.perf_counter()
+    data = pickle.dumps(encode(df), pickle.HIGHEST_PROTOCOL)
+    decode(pickle.loads(data))
+    return len(data), (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=float, default=1)
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    th_columns = ["WGMS_ID", "YEAR", "THICKNESS_CHG", "REFERENCE_DATE"]
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = {}
+        for name, table in [
+            ("A", raw_glacier_table),
+            ("B", raw_state_table),
+            ("D", raw_change_table),
+            ("EE", raw_massbalance_table),
+        ]:
+            paths[name] = os.path.join(directory, f"{name}.csv")
+            table(args.scale, args.seed).to_csv(paths[name], index=False)
+
+        jobs = {
+            "parse_A": (parse_A, paths["A"]),
+            "parse_B": (parse_B, paths["B"]),
+            "parse_D": (parse_D, paths["D"], th_columns, reference_year),
+            "parse_EE": (parse_EE, paths["EE"]),
+        }
+
+        results = {}
+        for label, processes in [("sequential", 1), ("pool", args.processes)]:
+            stages = StageCache(os.path.join(directory, label))
+            start = time.perf_counter()
+            results[label] = stages.run_many(jobs, processes)
+            elapsed = (time.perf_counter() - start) * 1000
+            print(f"{label:<10} {processes} process(es) {elapsed:9.1f} ms")
+
+        for name, df in results["sequential"].items():
+            pd.testing.assert_frame_equal(
+                results["pool"][name], df, check_dtype=False, check_index_type=False
+            )
+            size, ms = handoff(df, lambda df: df, lambda df: df)
+            line = f"  {name:<9} pickled {size / 2 ** 20:6.1f} MB {ms:7.1f} ms"
+            if pa is not None:
+                size, ms = handoff(df, to_arrow, from_arrow)
+                line += f"   Arrow stream {size / 2 ** 20:6.1f} MB {ms:7.1f} ms"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""Time map view and bounding box queries: full scans vs the GlacierGrid index
+
+Random glacier positions are indexed at several multiples of the 2019 release
+and queried with random map views and bounding boxes. Run from the repository
+root:
+
+    python -m benchmarks.spatial_benchmark --scales 1 10 100 --queries 500
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.filter_benchmark import report, time_requests
+from benchmarks.synthetic import base_num_glaciers
+from glacier_index import GlacierGrid
+
+
+def scan_view(grid, rows, view):
+    """Those of `rows` inside the cell range `view`, by comparing every glacier"""
+
+    level, x0, x1, y0, y1 = view
+    shift = grid.max_level - level
+    x, y = grid.x[rows] >> shift, grid.y[rows] >> shift
+    if x0 <= x1:
+        inside = (x >= x0) & (x <= x1)
+    else:
+        inside = (x >= x0) | (x <= x1)
+    inside &= (y >= y0) & (y <= y1)
+    return rows[inside]
+
+
+def scan_bbox(df, west, east, south, north):
+    """Rows inside the box, by comparing every glacier's coordinates"""
+
+    lon, lat = df["LONGITUDE"].to_numpy(), df["LATITUDE"].to_numpy()
+    span = (east - west) % 360 if east - west < 360 else 360
+    inside = ((lon - west) % 360 <= span) & (lat >= south) & (lat <= north)
+    return np.flatnonzero(inside)
+
+
+def random_positions(rng, num_glaciers):
+    """Glacier coordinates, half of them in a few mountain ranges"""
+
+    ranges = np.array([[9, 46], [86, 28], [-70, -33], [-140, 61], [75, 42]])
+    centers = ranges[rng.integers(len(ranges), size=num_glaciers)]
+    clustered = centers + rng.normal(0, 3, size=(num_glaciers, 2))
+    uniform = np.c_[
+        rng.uniform(-180, 180, size=num_glaciers),
+        rng.uniform(-60, 80, size=num_glaciers),
+    ]
+    lon_lat = np.where(rng.random((num_glaciers, 1)) < 0.5, clustered, uniform)
+    return pd.DataFrame(
+        {"LONGITUDE": (lon_lat[:, 0] + 180) % 360 - 180, "LATITUDE": lon_lat[:, 1]}
+    )
+
+
+def random_boxes(rng, num_queries):
+    """(zoom, (west, east, south, north)) of map views 1000 x 350 pixels in size"""
+
+    boxes = []
+    for _ in range(num_queries):
+        zoom = rng.uniform(2, 12)
+        lon, lat = rng.uniform(-180, 180), rng.uniform(-60, 70)
+        half_lon = 180 * 1000 / (512 * 2 ** zoom)
+        half_lat = min(180 * 350 / (512 * 2 ** zoom), 85)
+        boxes.append(
+            (
+                zoom,
+                (
+                    lon - half_lon,
+                    lon + half_lon,
+                    max(lat - half_lat, -85),
+                    min(lat + half_lat, 85),
+                ),
+            )
+        )
+    return boxes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", type=float, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for scale in args.scales:
+        rng = np.random.default_rng(args.seed)
+        df = random_positions(rng, int(base_num_glaciers * scale))
+        start = time.perf_counter()
+        grid = GlacierGrid(df)
+        build_ms = (time.perf_counter() - start) * 1000
+        print(f"{len(df.index):,} glaciers, index built in {build_ms:.1f} ms")
+
+        boxes = random_boxes(rng, args.queries)
+        views = [(grid.view(zoom, bounds),) for zoom, bounds in boxes]
+        rows = np.arange(len(df.index))
+        for (view,), (_, bounds) in zip(views[:100], boxes):
+            assert np.array_equal(grid.query(view), scan_view(grid, rows, view)), view
+            assert np.array_equal(grid.bbox(*bounds), scan_bbox(df, *bounds)), bounds
+
+        sizes = [len(grid.query(view)) for (view,) in views]
+        print(f"  {np.median(sizes):.0f} glaciers per view (median)")
+        report("  view scan", time_requests(lambda v: scan_view(grid, rows, v), views))
+        report("  view index", time_requests(grid.query, views))
+        bboxes = [bounds for _, bounds in boxes]
+        report("  bbox scan", time_requests(lambda *b: scan_bbox(df, *b), bboxes))
+        report("  bbox index", time_requests(grid.bbox, bboxes))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""Import time breakdown of application.py, with and without WGMS_LAZY_STARTUP
+
+Each run imports application.py in a fresh interpreter with -X importtime
+against a synthetic catalog, and reports the time spent importing each module
+application.py imports, its own module body, which loads the data unless
+startup is lazy, and the first request, /_dash-layout, which loads it when
+it is. Run from the repository root:
+
+    python -m benchmarks.startup_benchmark --scale 1 --repeats 5
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+from benchmarks.synthetic import synthetic_catalog, write_catalog
+
+
+worker = """
+import json, sys, time
+start = time.perf_counter()
+import application
+imported = time.perf_counter()
+pandas = "pandas" in sys.modules
+client = application.application.test_client()
+client.get("/_dash-layout")
+first_request = time.perf_counter()
+print(json.dumps(dict(
+    imported=imported - start,
+    first_request=first_request - imported,
+    pandas=pandas,
+)))
+"""
+
+
+def parse_importtime(stderr):
+    """{module: cumulative seconds} of what application imports, and the time of its body"""
+
+    children, modules, body = [], {}, None
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        own, cumulative, name = line[len("import time:") :].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        name = name.strip()
+        if depth == 0:
+            if name == "application":
+                modules, body = dict(children), int(own) / 1e6
+            children = []
+        elif depth == 1:
+            children.append((name, int(cumulative) / 1e6))
+    return modules, body
+
+
+def run(data_dir, lazy):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, WGMS_DATA_DIR=data_dir, WGMS_LAZY_STARTUP=str(int(lazy)))
+    process = subprocess.run(
+        [sys.executable, "-W", "ignore", "-X", "importtime", "-c", worker],
+        cwd=root,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    modules, body = parse_importtime(process.stderr)
+    return dict(json.loads(process.stdout.splitlines()[-1]), modules=modules, body=body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=float, default=1)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--top", type=int, default=8, help="modules listed")
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix="wgms_")
+    try:
+        write_catalog(data_dir, synthetic_catalog(args.scale, args.seed))
+        for lazy in [False, True]:
+            runs = [run(data_dir, lazy) for _ in range(args.repeats)]
+            median = lambda key: np.median([r[key] for r in runs]) * 1000
+
+            print(f"WGMS_LAZY_STARTUP={int(lazy)}, median of {args.repeats} runs")
+            print(f"  import application     {median('imported'):8.1f} ms")
+            modules = {}
+            for r in runs:
+                for name, seconds in r["modules"].items():
+                    modules.setdefault(name, []).append(seconds * 1000)
+            ranked = sorted(modules.items(), key=lambda m: -np.median(m[1]))
+            for name, times in ranked[: args.top]:
+                print(f"    {name:<24} {np.median(times):8.1f} ms")
+            print(f"    {'application body':<24} {median('body'):8.1f} ms")
+            print(f"  first request          {median('first_request'):8.1f} ms")
+            print(
+                f"  pandas imported on import: {runs[0]['pandas']}, "
+                f"import + first request {median('imported') + median('first_request'):.1f} ms"
+            )
+    finally:
+        shutil.rmtree(data_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""Compare load time and memory of pickled and Feather tables
+
+Each format is loaded in a fresh interpreter, once alone and once by several
+processes at the same time, reporting load time and the RSS and private
+(unshared) memory each process gains by loading the tables. Run from the repository root:
+
+    python -m benchmarks.storage_benchmark --scale 1 --processes 4
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.synthetic import synthetic_catalog
+from storage import compact_ts_dtypes, enforce_schema, feather, table_names, write_table
+
+
+load_script = """
+import sys, time
+sys.path.insert(0, {root!r})
+import storage
+if {force_pickle}:
+    storage.feather = None
+
+# Imported up front so that only the tables are in the measured memory
+import pandas
+import pyarrow.feather
+
+def memory():
+    values = {{}}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            key, value = line.split(":", 1)
+            if key in ("Rss", "Private_Clean", "Private_Dirty"):
+                values[key] = int(value.split()[0]) / 1024
+    return values["Rss"], values["Private_Clean"] + values["Private_Dirty"]
+
+rss_before, private_before = memory()
+start = time.perf_counter()
+tables = [storage.read_table({data_dir!r}, name) for name in storage.table_names]
+# Touch every column, as building the indexes does
+for df in tables:
+    for column in df.columns:
+        df[column].to_numpy()
+elapsed = time.perf_counter() - start
+
+rss, private = memory()
+print(elapsed * 1000, rss - rss_before, private - private_before)
+sys.stdin.read()
+"""
+
+
+def load(data_dir, force_pickle, processes):
+    """Load the tables in `processes` concurrent interpreters; (ms, RSS MB, private MB) each"""
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    script = load_script.format(root=root, data_dir=data_dir, force_pickle=force_pickle)
+    procs = [
+        subprocess.Popen(
+            [sys.executable, "-c", script],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            universal_newlines=True,
+        )
+        for _ in range(processes)
+    ]
+
+    # Keep every process alive until all have reported, so pages can be shared
+    results = [tuple(map(float, proc.stdout.readline().split())) for proc in procs]
+    for proc in procs:
+        proc.communicate("")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=float, default=1)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if feather is None:
+        sys.exit("pyarrow is required to write Feather tables")
+
+    df_combined, *ts_tables = synthetic_catalog(args.scale, args.seed)
+    tables = [enforce_schema(df_combined)[0]] + [
+        compact_ts_dtypes(df) for df in ts_tables
+    ]
+
+    with tempfile.TemporaryDirectory() as pickle_dir, tempfile.TemporaryDirectory() as feather_dir:
+        for name, df in zip(table_names, tables):
+            df.to_pickle(os.path.join(pickle_dir, name))
+            write_table(df, feather_dir, name)
+
+        for label, data_dir, force_pickle in [
+            ("pickle", pickle_dir, True),
+            ("feather", feather_dir, False),
+        ]:
+            size = sum(
+                os.path.getsize(os.path.join(data_dir, f)) for f in os.listdir(data_dir)
+            )
+            print(f"{label}: {size / 2 ** 20:.1f} MB on disk")
+            for processes in [1, args.processes]:
+                results = load(data_dir, force_pickle, processes)
+                ms, rss, private = [
+                    sum(r[i] for r in results) / processes for i in range(3)
+                ]
+                print(
+                    f"  {processes} process(es): load {ms:7.1f} ms   "
+                    f"RSS +{rss:6.1f} MB   private +{private:6.1f} MB per process"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+"""Synthetic WGMS catalogs matching the tables written by data_import.py"""
+
+import atexit
+import importlib
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from storage import (
+    compact_ts_dtypes,
+    enforce_schema,
+    table_names,
+    write_details,
+    write_table,
+)
+
+
+# Size of the 2019 FoG release after data_import.py
+base_num_glaciers = 32503
+base_ts_glaciers = dict(thickness=27775, massbalance=459, length=3252, area=10079)
+base_ts_rows = dict(thickness=40247, massbalance=6986, length=4631, area=12075)
+
+political_units = "AF AQ AR AT BO CA CH CL CN CO DE EC ES FR GL GS IN IS IT KG KZ MX NO NP NZ PE PK RU SE SJ TJ US UZ".split()
+# Columns of the compiled table that do not come from the A file
+a_derived_columns = [
+    "YEAR",
+    "HIGHEST_ELEVATION",
+    "LOWEST_ELEVATION",
+    "INVESTIGATOR",
+    "SPONS_AGENCY",
+    "REFERENCE",
+    "FIRST_MEAS",
+    "YEAR_MEASUREMENTS",
+    "THICKNESS_CHANGE_TS",
+    "LENGTH_TS",
+    "AREA_TS",
+    "MASS_BALANCE_TS",
+]
+region_codes = "ACN ACS ALA ANT ASC ASE ASN ASW CAU CEU GRL ISL NZL RUA SAN SCA SJM TRP WNA".split()
+
+
+def _text_column(rng, n, prefix, fill_fraction, length=1):
+    """Mostly "N/A" free text column with occasional long entries"""
+
+    values = np.full(n, "N/A", dtype=object)
+    filled = rng.random(n) < fill_fraction
+    values[filled] = [
+        f"{prefix} {i} " + "lorem ipsum " * int(length) for i in np.flatnonzero(filled)
+    ]
+    return values
+
+
+def _ts_table(rng, wgms_ids, num_glaciers, num_rows, value_column, scale_value):
+    """Time series with one row per (WGMS_ID, YEAR), sorted like groupby().median()"""
+
+    glaciers = rng.choice(
+        wgms_ids, size=min(num_glaciers, len(wgms_ids)), replace=False
+    )
+    ids = np.concatenate(
+        [glaciers, rng.choice(glaciers, size=max(num_rows - len(glaciers), 0))]
+    )
+    df = pd.DataFrame(
+        {
+            "WGMS_ID": ids,
+            "YEAR": rng.integers(1850, 2020, size=len(ids)),
+            value_column: np.round(rng.normal(0, scale_value, size=len(ids)), 1),
+        }
+    )
+    df = df.drop_duplicates(["WGMS_ID", "YEAR"]).sort_values(["WGMS_ID", "YEAR"])
+    return df.reset_index(drop=True)
+
+
+def synthetic_catalog(scale=1, seed=0):
+    """Generate (combined, thickness, massbalance, length, area) tables at `scale` times the 2019 release"""
+
+    rng = np.random.default_rng(seed)
+    n = int(base_num_glaciers * scale)
+    wgms_ids = np.arange(n, dtype=np.int64)
+
+    ts = {}
+    for key, value_column, scale_value in [
+        ("thickness", "THICKNESS_CHG", 5000),
+        ("massbalance", "ANNUAL_BALANCE", 800),
+        ("length", "LENGTH", 5),
+        ("area", "AREA", 20),
+    ]:
+        ts[key] = _ts_table(
+            rng,
+            wgms_ids,
+            int(base_ts_glaciers[key] * scale),
+            int(base_ts_rows[key] * scale),
+            value_column,
+            scale_value,
+        )
+    df_t = ts["thickness"]
+    df_t["REFERENCE_DATE"] = (
+        df_t["YEAR"] - rng.integers(1, 40, size=len(df_t.index))
+    ).astype(float)
+    ts["length"]["LENGTH"] = ts["length"]["LENGTH"].abs()
+    ts["area"]["AREA"] = ts["area"]["AREA"].abs()
+
+    codes = np.arange(11, dtype=float)
+    code_weights = np.r_[np.full(10, 0.04), 0.6]
+    highest = rng.uniform(500, 7000, size=n)
+    has_elevation = rng.random(n) < 0.3
+
+    df = pd.DataFrame(
+        {
+            "WGMS_ID": wgms_ids,
+            "LONGITUDE": rng.uniform(-180, 180, size=n),
+            "LATITUDE": rng.uniform(-60, 80, size=n),
+            "POLITICAL_UNIT": rng.choice(political_units, size=n),
+            "GLACIER_REGION_CODE": rng.choice(region_codes, size=n),
+            "SPEC_LOCATION": _text_column(rng, n, "Valley", 0.3),
+            "NAME": [f"Unnamed {i}" for i in wgms_ids],
+            "PRIM_CLASSIFIC": rng.choice(codes, size=n, p=code_weights),
+            "FORM": rng.choice(codes, size=n, p=code_weights),
+            "FRONTAL_CHARS": rng.choice(codes, size=n, p=code_weights),
+            "EXPOS_ACC_AREA": np.where(rng.random(n) < 0.06, "N", None),
+            "EXPOS_ABL_AREA": np.where(rng.random(n) < 0.06, "S", None),
+            "REMARKS": _text_column(rng, n, "Remark", 0.2, length=8),
+            "YEAR": np.where(has_elevation, rng.integers(1900, 2019, size=n), np.nan),
+            "HIGHEST_ELEVATION": np.where(has_elevation, highest, np.nan),
+            "LOWEST_ELEVATION": np.where(has_elevation, highest * 0.7, np.nan),
+            "INVESTIGATOR": _text_column(rng, n, "Investigator", 0.2),
+            "SPONS_AGENCY": _text_column(rng, n, "Agency", 0.2, length=3),
+            "REFERENCE": _text_column(rng, n, "Reference", 0.3, length=12),
+        }
+    )
+
+    # Derived columns, as in the "Extract site Time Series Characteristics" section
+    years = pd.concat([t.loc[:, ["WGMS_ID", "YEAR"]] for t in ts.values()])
+    first_meas = years.groupby("WGMS_ID")["YEAR"].min()
+    year_measurements = years.drop_duplicates().groupby("WGMS_ID").size()
+    df["FIRST_MEAS"] = df["WGMS_ID"].map(first_meas).fillna(2020).astype(float)
+    df["YEAR_MEASUREMENTS"] = (
+        df["WGMS_ID"].map(year_measurements).fillna(0).astype(float)
+    )
+    for column, key in [
+        ("THICKNESS_CHANGE_TS", "thickness"),
+        ("LENGTH_TS", "length"),
+        ("AREA_TS", "area"),
+        ("MASS_BALANCE_TS", "massbalance"),
+    ]:
+        df[column] = df["WGMS_ID"].isin(ts[key]["WGMS_ID"])
+
+    df = df.sort_values("POLITICAL_UNIT", kind="mergesort").reset_index(drop=True)
+
+    return df, ts["thickness"], ts["massbalance"], ts["length"], ts["area"]
+
+
+def _raw_survey_table(rng, num_glaciers, num_keys, max_bands, value_columns, text):
+    """FoG style survey rows: several elevation bands per (WGMS_ID, YEAR), glaciers contiguous"""
+
+    keys = pd.DataFrame(
+        {
+            "WGMS_ID": rng.integers(0, num_glaciers, size=num_keys),
+            "YEAR": rng.integers(1850, 2020, size=num_keys),
+        }
+    ).drop_duplicates()
+    keys = keys.sort_values("WGMS_ID", kind="mergesort")
+    bands = rng.integers(1, max_bands + 1, size=len(keys.index))
+    df = keys.loc[keys.index.repeat(bands)].reset_index(drop=True)
+    n = len(df.index)
+
+    for column, scale_value in value_columns.items():
+        values = np.round(rng.normal(0, scale_value, size=n), 1)
+        df[column] = np.where(rng.random(n) < 0.1, np.nan, values)
+    if not text:
+        return df
+
+    df.insert(0, "POLITICAL_UNIT", rng.choice(political_units, size=n))
+    df.insert(1, "NAME", [f"Unnamed {i}" for i in df["WGMS_ID"]])
+    df.insert(4, "LOWER_BOUND", rng.integers(0, 60, size=n) * 100)
+    df.insert(5, "UPPER_BOUND", df["LOWER_BOUND"] + 100)
+    df["INVESTIGATOR"] = _text_column(rng, n, "Investigator", 0.5)
+    df["REFERENCE"] = _text_column(rng, n, "Reference", 0.5, length=12)
+    df["REMARKS"] = _text_column(rng, n, "Remark", 0.2, length=8)
+    return df
+
+
+def raw_glacier_table(scale=1, seed=0):
+    """Synthetic WGMS-FoG-2019-12-A-GLACIER.csv at `scale` times the 2019 release"""
+
+    df = synthetic_catalog(scale, seed)[0]
+    rng = np.random.default_rng(seed)
+    n = len(df.index)
+
+    df = df.loc[:, [c for c in df.columns if c not in a_derived_columns]]
+    df["NAME"] = df["NAME"].str.upper()
+    df["SPEC_LOCATION"] = df["SPEC_LOCATION"].str.upper()
+    df["FORM"] = np.where(rng.random(n) < 0.05, " ", df["FORM"].astype(int).astype(str))
+    df.loc[rng.random(n) < 0.01, "LATITUDE"] = np.nan
+    return df.sort_values("WGMS_ID", ignore_index=True)
+
+
+def raw_change_table(scale=1, seed=0, text=True):
+    """Synthetic WGMS-FoG-2019-12-D-CHANGE.csv at `scale` times the 2019 release
+
+    With text=False only the numeric columns are generated.
+    """
+
+    rng = np.random.default_rng(seed)
+    df = _raw_survey_table(
+        rng,
+        int(base_num_glaciers * scale),
+        int(base_ts_rows["thickness"] * scale),
+        5,
+        dict(AREA_CHANGE=50, THICKNESS_CHG=5000, VOLUME_CHANGE=1000),
+        text,
+    )
+    n = len(df.index)
+    year = df["YEAR"] - rng.integers(1, 40, size=n)
+    day = np.where(rng.random(n) < 0.3, 9999, rng.integers(101, 1232, size=n))
+    df["REFERENCE_DATE"] = year * 10000 + day
+    return df
+
+
+def raw_massbalance_table(scale=1, seed=0, text=True):
+    """Synthetic WGMS-FoG-2019-12-EE-MASS-BALANCE.csv at `scale` times the 2019 release"""
+
+    rng = np.random.default_rng(seed)
+    return _raw_survey_table(
+        rng,
+        int(base_num_glaciers * scale),
+        int(base_ts_rows["massbalance"] * scale),
+        20,
+        dict(AREA=20, WINTER_BALANCE=800, SUMMER_BALANCE=800, ANNUAL_BALANCE=800),
+        text,
+    )
+
+
+def raw_state_table(scale=1, seed=0, text=True):
+    """Synthetic WGMS-FoG-2019-12-B-STATE.csv at `scale` times the 2019 release"""
+
+    rng = np.random.default_rng(seed)
+    return _raw_survey_table(
+        rng,
+        int(base_num_glaciers * scale),
+        int(base_ts_rows["area"] * scale),
+        2,
+        dict(HIGHEST_ELEVATION=2000, LOWEST_ELEVATION=1000, AREA=20, LENGTH=5),
+        text,
+    )
+
+
+def write_catalog(directory, tables):
+    """Write synthetic tables the way data_import.py saves the real ones"""
+
+    os.makedirs(directory, exist_ok=True)
+    df_combined, df_details = enforce_schema(tables[0])
+    ts_tables = [compact_ts_dtypes(df) for df in tables[1:]]
+
+    for name, df in zip(table_names, [df_combined] + ts_tables):
+        write_table(df, directory, name)
+    write_details(df_details, directory)
+
+
+def load_application(scale, seed, directory=None):
+    """Import application.py against a synthetic catalog written to `directory`
+
+    Without a directory, a temporary one is used and removed at exit. As
+    application.py reads its settings while it is imported, a module imported
+    before is reloaded, so it never keeps the catalog or settings of an earlier
+    call.
+    """
+
+    if directory is None:
+        directory = tempfile.mkdtemp(prefix="wgms_")
+        atexit.register(shutil.rmtree, directory, True)
+    write_catalog(directory, synthetic_catalog(scale, seed))
+
+    previous = os.environ.get("WGMS_DATA_DIR")
+    os.environ["WGMS_DATA_DIR"] = directory
+    try:
+        if "application" in sys.modules:
+            return importlib.reload(sys.modules["application"])
+        import application
+
+        return application
+    finally:
+        if previous is None:
+            del os.environ["WGMS_DATA_DIR"]
+        else:
+            os.environ["WGMS_DATA_DIR"] = previous
+
+
+def random_filter_inputs(rng, num_requests):
+    """Random combinations of the nine update_satellite_map filter inputs"""
+
+    def dropdown():
+        if rng.random() < 0.5:
+            return [None, []][rng.integers(2)]
+        size = rng.integers(1, 5)
+        return [int(v) for v in rng.choice(11, size=size, replace=False)]
+
+    def checkbox():
+        return [None, [], [1]][rng.choice(3, p=[0.5, 0.2, 0.3])]
+
+    requests = []
+    for _ in range(num_requests):
+        requests.append(
+            (
+                int(rng.choice([2020, int(rng.integers(1850, 2021))])),
+                int(rng.choice([0, int(rng.integers(0, 21))])),
+                dropdown(),
+                dropdown(),
+                dropdown(),
+                checkbox(),
+                checkbox(),
+                checkbox(),
+                checkbox(),
+            )
+        )
+    return requests
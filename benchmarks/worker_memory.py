@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""Memory of gunicorn workers, with and without preloading the app in the master
+
+For each worker count, gunicorn serves a synthetic catalog once with every
+worker importing application.py itself, and once with WGMS_PRELOAD=1 (see
+gunicorn.conf.py), which loads the data in the master before the workers are
+forked. Further settings can be passed with --env, e.g.
+--env WGMS_COMPACT_MAP=1. After
+replaying browser traffic as benchmarks.load_test does, it reads
+/proc/<pid>/smaps_rollup of the master and each worker and reports their RSS,
+PSS (shared pages divided among the processes mapping them) and USS (pages
+only that process maps). Run from the repository root:
+
+    python -m benchmarks.worker_memory --scale 10 --workers 1 2 4 8
+"""
+
+import argparse
+import shutil
+import signal
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from benchmarks.load_test import free_port, sessions, start_server, user, Results
+from benchmarks.synthetic import synthetic_catalog, write_catalog
+
+
+modes = {
+    "separate": {"WGMS_PRELOAD": "0"},
+    "preload": {"WGMS_PRELOAD": "1"},
+}
+
+
+def smaps_rollup(pid):
+    """{field: MB} of /proc/<pid>/smaps_rollup"""
+
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    fields["Uss"] = fields["Private_Clean"] + fields["Private_Dirty"]
+    return fields
+
+
+def children(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(child) for child in f.read().split()]
+
+
+def replay(port, callbacks, wgms_ids, concurrency, duration, seed):
+    """Send load_test traffic from `concurrency` users for `duration` seconds"""
+
+    stop = threading.Event()
+    results = Results()
+    threads = [
+        threading.Thread(
+            target=user,
+            args=(port, callbacks, sessions([seed, i], wgms_ids), stop, results),
+        )
+        for i in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return sum(len(v) for v in results.latencies.values())
+
+
+def measure(data_dir, mode, workers, wgms_ids, args):
+    """smaps_rollup of the master and of each worker after replaying traffic"""
+
+    port = free_port()
+    env = dict(args.env, **modes[mode])
+    server, callbacks = start_server(data_dir, workers, 1, port, env=env)
+    try:
+        requests = replay(
+            port, callbacks, wgms_ids, 2 * workers, args.duration, args.seed
+        )
+        time.sleep(1)
+        master = smaps_rollup(server.pid)
+        worker = [smaps_rollup(pid) for pid in children(server.pid)]
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait()
+    return master, worker, requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=float, default=10)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--modes", nargs="+", default=list(modes), choices=modes)
+    parser.add_argument("--duration", type=float, default=10, help="seconds of traffic")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--env", nargs="*", default=[], help="KEY=VALUE settings of application.py"
+    )
+    args = parser.parse_args()
+    args.env = dict(setting.split("=", 1) for setting in args.env)
+
+    data_dir = tempfile.mkdtemp(prefix="wgms_")
+    try:
+        tables = synthetic_catalog(args.scale, args.seed)
+        wgms_ids = tables[0]["WGMS_ID"].to_numpy()
+        write_catalog(data_dir, tables)
+        del tables
+
+        print(
+            f"{'mode':<9} {'workers':>7}  {'master PSS':>10}  {'worker RSS':>10}  "
+            f"{'worker PSS':>10}  {'worker USS':>10}  {'total PSS':>10}  requests"
+        )
+        for mode in args.modes:
+            for workers in args.workers:
+                master, worker, requests = measure(
+                    data_dir, mode, workers, wgms_ids, args
+                )
+                mean = lambda key: np.mean([w[key] for w in worker])
+                total = master["Pss"] + sum(w["Pss"] for w in worker)
+                print(
+                    f"{mode:<9} {workers:>7}  {master['Pss']:7.0f} MB  "
+                    f"{mean('Rss'):7.0f} MB  {mean('Pss'):7.0f} MB  "
+                    f"{mean('Uss'):7.0f} MB  {total:7.0f} MB  {requests:8d}"
+                )
+    finally:
+        shutil.rmtree(data_dir)
+
+
+if __name__ == "__main__":
+    main()
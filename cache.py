@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from contextlib import closing
+
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+# Dropdown codes, an empty dropdown selects all of them
+dropdown_codes = frozenset(range(11))
+
+
+def _dropdown_key(selected):
+    if not selected or dropdown_codes.issubset(selected):
+        return ()
+    return tuple(sorted(set(selected)))
+
+
+def canonical_filter_key(
+    first_meas,
+    years_data,
+    prim_classific,
+    form,
+    frontal_chars,
+    checkbox_mb,
+    checkbox_length,
+    checkbox_tc,
+    checkbox_area,
+):
+    """Hashable key for the selection filters; equivalent selections map to the same key"""
+
+    return (
+        first_meas,
+        years_data,
+        _dropdown_key(prim_classific),
+        _dropdown_key(form),
+        _dropdown_key(frontal_chars),
+        checkbox_mb == [1],
+        checkbox_length == [1],
+        checkbox_tc == [1],
+        checkbox_area == [1],
+    )
+
+
+class LRUCache:
+    """Bounded, thread-safe cache evicting the least recently used entry
+
+    With `maxbytes`, each entry weighs the `size` it was put with, such as the
+    length of the value serialized, and the entries are also kept within that
+    total. A value larger than `maxbytes` is not stored.
+    """
+
+    def __init__(self, maxsize=256, maxbytes=None):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.currbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Cached value for `key`, or None"""
+
+        with self._lock:
+            try:
+                value, _ = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, size=0):
+        if self.maxbytes is not None and size > self.maxbytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.currbytes -= previous[1]
+            self._entries[key] = value, size
+            self.currbytes += size
+            while len(self._entries) > self.maxsize or (
+                self.maxbytes is not None and self.currbytes > self.maxbytes
+            ):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.currbytes -= evicted_size
+
+    def cache_info(self):
+        """Hit and miss counters, in the style of functools.lru_cache"""
+
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self._entries))
+
+    def cache_clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.currbytes = 0
+            self.hits = self.misses = 0
+
+
+def dataset_version(paths):
+    """Hash of the data files, so cached outputs never outlive the data they came from"""
+
+    digest = hashlib.sha1()
+    for path in paths:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+class SharedCache:
+    """Cache backed by a SQLite file, shared by every worker process on the host
+
+    Values are stored as JSON, keyed by namespace, normalized inputs and the
+    dataset version. Entries written for another dataset version are dropped
+    when the cache is opened. With `maxbytes`, the least recently used entries
+    are deleted whenever the stored JSON grows beyond that length, and a value
+    longer than `maxbytes` is not stored.
+    """
+
+    columns = ["version", "key", "value", "size", "accessed"]
+
+    def __init__(self, path, version, encoder=None, timeout=5, maxbytes=None):
+        self.path = path
+        self.version = version
+        self.encoder = encoder
+        self.timeout = timeout
+        self.maxbytes = maxbytes
+
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            existing = [row[1] for row in conn.execute("PRAGMA table_info(outputs)")]
+            if existing and existing != self.columns:
+                # Written by an older version of this class
+                conn.execute("DROP TABLE outputs")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS outputs (version TEXT, key TEXT, "
+                "value TEXT, size INTEGER, accessed REAL, PRIMARY KEY (version, key))"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS outputs_accessed ON outputs (accessed)"
+            )
+            conn.execute("DELETE FROM outputs WHERE version != ?", (version,))
+
+    def _connect(self):
+        # A connection per call keeps this safe across forked workers and threads
+        return sqlite3.connect(self.path, timeout=self.timeout)
+
+    def _key(self, namespace, key):
+        return json.dumps([namespace, key])
+
+    def get(self, namespace, key):
+        """Cached value for `key` in `namespace`, or None"""
+
+        encoded = self.get_encoded(namespace, key)
+        return None if encoded is None else json.loads(encoded)
+
+    def get_encoded(self, namespace, key):
+        """JSON of the cached value for `key` in `namespace`, or None"""
+
+        key = self._key(namespace, key)
+        try:
+            with closing(self._connect()) as conn, conn:
+                row = conn.execute(
+                    "SELECT value FROM outputs WHERE version = ? AND key = ?",
+                    (self.version, key),
+                ).fetchone()
+                if row:
+                    conn.execute(
+                        "UPDATE outputs SET accessed = ? WHERE version = ? AND key = ?",
+                        (time.time(), self.version, key),
+                    )
+        except sqlite3.Error:
+            return None
+        return row[0] if row else None
+
+    def put(self, namespace, key, value):
+        self.put_encoded(namespace, key, json.dumps(value, cls=self.encoder))
+
+    def put_encoded(self, namespace, key, encoded):
+        """Store a value already serialized to JSON"""
+
+        if self.maxbytes is not None and len(encoded) > self.maxbytes:
+            return
+
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO outputs VALUES (?, ?, ?, ?, ?)",
+                    (
+                        self.version,
+                        self._key(namespace, key),
+                        encoded,
+                        len(encoded),
+                        time.time(),
+                    ),
+                )
+                if self.maxbytes is not None:
+                    self._prune(conn)
+        except sqlite3.Error:
+            # The shared cache is an optimization, a busy or broken store is skipped
+            pass
+
+    def _prune(self, conn):
+        """Delete the least recently used entries until the rest fit in maxbytes"""
+
+        (currbytes,) = conn.execute("SELECT TOTAL(size) FROM outputs").fetchone()
+        evicted = []
+        for rowid, size in conn.execute(
+            "SELECT rowid, size FROM outputs ORDER BY accessed"
+        ):
+            if currbytes <= self.maxbytes:
+                break
+            evicted.append((rowid,))
+            currbytes -= size
+        conn.executemany("DELETE FROM outputs WHERE rowid = ?", evicted)
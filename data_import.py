@@ -23,6 +23,28 @@ import string
 import os
 import requests, zipfile, io
 
+from figures import glacier_figures, write_figure_bundle
+from glacier_index import TimeSeriesIndex
+from ingest import (
+    join_glaciers,
+    parse_A,
+    parse_B,
+    parse_D,
+    parse_EE,
+    reference_year,
+    stream_ts_median,
+    ts_median,
+)
+from pipeline import StageCache
+from storage import (
+    compact_ts_dtypes,
+    enforce_schema,
+    table_names,
+    table_path,
+    write_details,
+    write_table,
+)
+
 
 # %%
 # Data Directory / Files
@@ -30,17 +52,21 @@ data_dir = "./DOI-WGMS-FoG-2019-12"
 data_archive_url = "https://wgms.ch/downloads/DOI-WGMS-FoG-2019-12.zip"
 target_path = './DOI-WGMS-FoG-2019-12.zip'
 
-# Download if not present,      
-if not os.path.exists(data_dir):
-    response = requests.get(data_archive_url, stream=True)
-    with open(target_path, "wb") as target_file:
-        for chunk in response.iter_content(chunk_size=512):
-            if chunk:  
-                target_file.write(chunk)
-    z = zipfile.ZipFile(target_path)
-    z.extractall()
-    
+# Stage results are cached here, keyed by checksums of their inputs, so a rerun
+# only rebuilds what a new WGMS release (or a code change) affects
+stages = StageCache("./import_cache")
 
+# Download if not present, reusing an archive that was already downloaded
+with stages.timed("download"):
+    if not os.path.exists(data_dir):
+        if not os.path.exists(target_path):
+            response = requests.get(data_archive_url, stream=True)
+            with open(target_path, "wb") as target_file:
+                for chunk in response.iter_content(chunk_size=512):
+                    if chunk:  
+                        target_file.write(chunk)
+        z = zipfile.ZipFile(target_path)
+        z.extractall()
 
 
 # %%
@@ -51,6 +77,15 @@ d_change_file = "WGMS-FoG-2019-12-D-CHANGE.csv"
 e_massbalance_file = "WGMS-FoG-2019-12-E-MASS-BALANCE-OVERVIEW.csv"
 ee_massbalance_file = "WGMS-FoG-2019-12-EE-MASS-BALANCE.csv"
 
+# Read the D and EE files this many rows at a time, folding each chunk into the
+# per-(WGMS_ID, YEAR) medians, so peak memory does not grow with the file size.
+# None reads each file whole.
+stream_chunksize = None
+
+# Parse the A, B, D and EE files in this many worker processes at once; 1
+# parses them one after another
+parse_processes = 1
+
 
 # %% [markdown]
 # #### At this point, open the `a_glacier_file`,  `ee_glacier_file` files and resave in utf-8 format (LibreOffice Calc works).
@@ -60,32 +95,34 @@ ee_massbalance_file = "WGMS-FoG-2019-12-EE-MASS-BALANCE.csv"
 df_compiled = pd.DataFrame()
 
 # %% [markdown]
-# ### Extract relevant Glacial Characteristics from the WGMS_A file
+# ### Parse the WGMS Files
+#
+# The A, B, D and EE files are independent until the merge below, so they are parsed together, in `parse_processes` worker processes. The parse functions are in `ingest.py` so the workers can import them. With `stream_chunksize` set, the D and EE files are instead streamed straight into their medians further down.
 
 # %%
-df_A = pd.read_csv(os.path.join(data_dir, a_glacier_file))
-df_A.dropna(axis="rows", subset=["LONGITUDE", "LATITUDE"], inplace=True)
-
-# %%
-df_A.columns
-
-# %%
-# Prettify Capitalization
-df_A['NAME'] = df_A['NAME'].apply(lambda x: string.capwords(x))
-
-notna = df_A['SPEC_LOCATION'].notna()
-df_A.loc[notna,'SPEC_LOCATION'] = df_A.loc[notna,'SPEC_LOCATION'].apply(lambda x: string.capwords(str(x)))
-
-# Change to Float for Consistency
-df_A['PRIM_CLASSIFIC'] = df_A['PRIM_CLASSIFIC'].astype(float)
-df_A['FORM'] = df_A['FORM'].replace(' ', np.nan).astype(float)
-df_A['FRONTAL_CHARS'] = df_A['FRONTAL_CHARS'].astype(float)
-
+th_columns = ["WGMS_ID", "YEAR", "THICKNESS_CHG",'REFERENCE_DATE']
+d_path = os.path.join(data_dir, d_change_file)
+ee_path = os.path.join(data_dir, ee_massbalance_file)
 
+parse_jobs = {
+    "parse_A": (parse_A, os.path.join(data_dir, a_glacier_file)),
+    "parse_B": (parse_B, os.path.join(data_dir, b_glacier_file)),
+}
+if stream_chunksize is None:
+    parse_jobs["parse_D"] = (parse_D, d_path, th_columns, reference_year)
+    parse_jobs["parse_EE"] = (parse_EE, ee_path)
 
+parsed = stages.run_many(parse_jobs, parse_processes)
 
+# %% [markdown]
+# ### Extract relevant Glacial Characteristics from the WGMS_A file
 
+# %%
+# Names and locations are capitalized, and classification codes are floats, by parse_A
+df_A = parsed["parse_A"]
 
+# %%
+df_A.columns
 
 # %%
 # Extract relevant columns
@@ -112,8 +149,7 @@ df_compiled = df_A.loc[:, A_columns]
 # ### Extract additional data from WGMS_B File
 
 # %%
-df_B = pd.read_csv(os.path.join(data_dir, b_glacier_file))
-df_B = df_B.query("YEAR > 0")
+df_B = parsed["parse_B"]
 df_B.columns
 
 # %%
@@ -142,42 +178,36 @@ df_B_reduced.drop_duplicates("WGMS_ID", keep="last", inplace=True)
 # 3. Length
 
 # %%
-def ts_helper(df, columns):
-    """Extract time series data so that: 
-        1: There is one measurement per year; multiple measurements are summarized crudely with median()
-        """
-
-    # One measurement per Year
-    df_median = df.loc[:, columns].groupby(columns[0:2], as_index=False).median()
-    df_out = df_median
-
-    return df_out
+# Extract time series data so that:
+#     1: There is one measurement per year; multiple measurements are summarized crudely with median()
+# ts_median gives the same result as groupby(columns[0:2]).median(), sorting integer encoded keys instead
+ts_helper = ts_median
 
 
 # %% [markdown]
 # ### Thickness Change
 
 # %%
-df_D = pd.read_csv(os.path.join(data_dir, d_change_file))
-df_D.columns
-
-# %%
-th_columns = ["WGMS_ID", "YEAR", "THICKNESS_CHG",'REFERENCE_DATE']
-df_D_ = df_D.loc[:,th_columns]
-df_D_.dropna(axis=0, how="any", inplace=True)
-
-# %%
-df_D_['REFERENCE_DATE'] = df_D_['REFERENCE_DATE'].apply(lambda x: int(str(x)[0:4]))
-
-# %%
-df_thickness_chg = ts_helper(df_D_, th_columns)
+if stream_chunksize is None:
+    df_D_ = parsed["parse_D"]
+    df_thickness_chg = stages.run("thickness_chg", ts_helper, df_D_, th_columns)
+else:
+    df_thickness_chg = stages.run(
+        "thickness_chg",
+        stream_ts_median,
+        d_path,
+        th_columns,
+        stream_chunksize,
+        th_columns,
+        reference_year,
+    )
 
 # %% [markdown]
 # ### Area
 
 # %%
 area_columns = ["WGMS_ID", "YEAR", "AREA"]
-df_area = ts_helper(df_B, area_columns)
+df_area = stages.run("area", ts_helper, df_B, area_columns)
 df_area.dropna(axis="rows", inplace=True)
 
 # %%
@@ -188,7 +218,7 @@ df_area.head(n=5)
 
 # %%
 length_columns = ["WGMS_ID", "YEAR", "LENGTH"]
-df_length = ts_helper(df_B, length_columns)
+df_length = stages.run("length", ts_helper, df_B, length_columns)
 df_length.dropna(axis="rows", inplace=True)
 
 
@@ -199,11 +229,20 @@ df_length.head(n=5)
 # ### Mass Balance
 
 # %%
-df_EE = pd.read_csv(os.path.join(data_dir, ee_massbalance_file))
-df_EE.dropna(axis="rows", subset=["ANNUAL_BALANCE"], inplace=True)
-
 EE_columns = ["WGMS_ID", "YEAR", "ANNUAL_BALANCE"]
-df_mass_balance = ts_helper(df_EE, EE_columns)
+
+if stream_chunksize is None:
+    df_EE = parsed["parse_EE"]
+    df_mass_balance = stages.run("mass_balance", ts_helper, df_EE, EE_columns)
+else:
+    df_mass_balance = stages.run(
+        "mass_balance",
+        stream_ts_median,
+        ee_path,
+        EE_columns,
+        stream_chunksize,
+        ["ANNUAL_BALANCE"],
+    )
 
 # %% [markdown]
 # ### Extract site Time Series Characteristics
@@ -242,7 +281,7 @@ df_year_measurement.rename({0: "YEAR_MEASUREMENTS"}, axis=1, inplace=True)
 df_thickness_ts_bool = pd.DataFrame({'WGMS_ID': df_thickness_chg['WGMS_ID'].unique(), 'THICKNESS_CHANGE_TS': True})
 df_length_ts_bool = pd.DataFrame({'WGMS_ID': df_length['WGMS_ID'].unique(), 'LENGTH_TS': True})
 df_area_ts_bool = pd.DataFrame({'WGMS_ID': df_area['WGMS_ID'].unique(), 'AREA_TS': True})
-df_mb_ts_bool = pd.DataFrame({'WGMS_ID': df_mass_balance['WGMS_ID'].unique(), 't': True})
+df_mb_ts_bool = pd.DataFrame({'WGMS_ID': df_mass_balance['WGMS_ID'].unique(), 'MASS_BALANCE_TS': True})
 
 
 # %%
@@ -252,52 +291,120 @@ df_mb_ts_bool.head(n=5)
 # ### Concatenate
 
 # %%
-df_compiled = df_compiled.merge(df_B_reduced, how="left", on="WGMS_ID", validate="1:1")
-df_compiled = df_compiled.merge(df_first_measurement, on="WGMS_ID", how="left")
-df_compiled = df_compiled.merge(df_year_measurement, on="WGMS_ID", how="left")
-
-df_compiled = df_compiled.merge(df_thickness_ts_bool, on="WGMS_ID", how="left")
-df_compiled = df_compiled.merge(df_length_ts_bool, on="WGMS_ID", how="left")
-df_compiled = df_compiled.merge(df_area_ts_bool, on="WGMS_ID", how="left")
-df_compiled = df_compiled.merge(df_mb_ts_bool, on="WGMS_ID", how="left")
-
-
 #Set Sensible Null Values
 # Set first measurement to 2020 if value is Nan, measured years to zero if value is NaN
-df_compiled.replace(
-    {
-        "FIRST_MEAS": {np.nan: 2020},
-        "YEAR_MEASUREMENTS": {np.nan: 0},
-        "PRIM_CLASSIFIC": {np.nan: 10},
-        "FORM": {np.nan: 10},
-        "FRONTAL_CHARS": {np.nan: 10},
-        "SPEC_LOCATION": {np.nan: "N/A"},
-        "NAME": {np.nan: "N/A"},
-        "INVESTIGATOR": {np.nan: "N/A"},
-        "SPONS_AGENCY": {np.nan: "N/A"},
-        "REMARKS": {np.nan: "N/A"},
-        "REFERENCE": {np.nan: "N/A"},
-        "THICKNESS_CHANGE_TS": {np.nan: False},
-        "LENGTH_TS": {np.nan: False},
-        "AREA_TS": {np.nan: False},
-        "MASS_BALANCE_TS": {np.nan: False},
-
-    },
-    inplace=True,
+defaults = {
+    "FIRST_MEAS": 2020,
+    "YEAR_MEASUREMENTS": 0,
+    "PRIM_CLASSIFIC": 10,
+    "FORM": 10,
+    "FRONTAL_CHARS": 10,
+    "SPEC_LOCATION": "N/A",
+    "NAME": "N/A",
+    "INVESTIGATOR": "N/A",
+    "SPONS_AGENCY": "N/A",
+    "REMARKS": "N/A",
+    "REFERENCE": "N/A",
+    "THICKNESS_CHANGE_TS": False,
+    "LENGTH_TS": False,
+    "AREA_TS": False,
+    "MASS_BALANCE_TS": False,
+}
+
+# Align every per-glacier table on WGMS_ID and concatenate them in one pass
+df_compiled = stages.run(
+    "join",
+    join_glaciers,
+    df_compiled,
+    [
+        df_B_reduced,
+        df_first_measurement,
+        df_year_measurement,
+        df_thickness_ts_bool,
+        df_length_ts_bool,
+        df_area_ts_bool,
+        df_mb_ts_bool,
+    ],
+    defaults,
 )
 
 # %%
 df_compiled.head(n=4)
 
+# %% [markdown]
+# ### Enforce Schema
+#
+# Classification codes become int8, years int16, time series flags bool, and country / region codes categoricals. The long free text columns move to the `wgms_details.db` SQLite side table, from which the dashboard reads one glacier at a time for the glacier info panel.
+
+# %%
+df_compiled, df_details = enforce_schema(df_compiled)
+
+df_compiled.memory_usage(deep=True).sum(), df_details.memory_usage(deep=True).sum()
+
 # %% [markdown]
 # ### Save Files
 
 # %%
-df_compiled.to_pickle("wgms_combined")
-df_thickness_chg.to_pickle("wgms_thickness")
-df_mass_balance.to_pickle("wgms_massbalance")
-df_length.to_pickle("wgms_length")
-df_area.to_pickle("wgms_area")
+# Compact time series dtypes
+df_thickness_chg = compact_ts_dtypes(df_thickness_chg)
+df_mass_balance = compact_ts_dtypes(df_mass_balance)
+df_length = compact_ts_dtypes(df_length)
+df_area = compact_ts_dtypes(df_area)
+
+# Feather files when pyarrow is installed, pickles otherwise
+def export(df_compiled, df_details, df_thickness_chg, df_mass_balance, df_length, df_area):
+    write_table(df_compiled, ".", "wgms_combined")
+    write_details(df_details, ".")
+    write_table(df_thickness_chg, ".", "wgms_thickness")
+    write_table(df_mass_balance, ".", "wgms_massbalance")
+    write_table(df_length, ".", "wgms_length")
+    write_table(df_area, ".", "wgms_area")
+
+
+stages.run(
+    "export",
+    export,
+    df_compiled,
+    df_details,
+    df_thickness_chg,
+    df_mass_balance,
+    df_length,
+    df_area,
+    outputs=[table_path(".", name) for name in table_names] + ["wgms_details.db"],
+)
+
+# %% [markdown]
+# ### Pre-render Glacier Figures
+#
+# Figures of every glacier with time series data, served by `update_glacier_figures` with a single read. Glaciers missing from the bundle are rendered on request, so skipping this stage trades CPU for disk. Set `figure_compression = 0` to store uncompressed JSON.
+
+# %%
+figure_compression = 6
+
+
+def render_figures(ts_tables, compression):
+    ts_indexes = [TimeSeriesIndex(df) for df in ts_tables]
+    figure_ids = sorted(
+        set().union(*[index.wgms_ids.tolist() for index in ts_indexes])
+    )
+
+    write_figure_bundle(
+        "wgms_figures",
+        (
+            (wgms_id, glacier_figures(*[index.get(wgms_id) for index in ts_indexes]))
+            for wgms_id in figure_ids
+        ),
+        compression=compression,
+    )
+
+
+stages.run(
+    "figures",
+    render_figures,
+    [df_thickness_chg, df_mass_balance, df_length, df_area],
+    figure_compression,
+    outputs=["wgms_figures", "wgms_figures.index.npy"],
+)
 
 # %% [markdown]
 # ### WGMS ID of MER DE GLACE
@@ -310,3 +417,11 @@ df_compiled[df_compiled["NAME"].str.contains("glace", case=False)]
 df_compiled.query("THICKNESS_CHANGE_TS in [True, False]").count()
 
 # %%
+
+# %% [markdown]
+# ### Stage Timings
+#
+# `cached` stages were skipped because their inputs and code are unchanged since the last run.
+
+# %%
+stages.report()
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+
+import json
+import mmap
+import zlib
+
+import numpy as np
+from plotly.utils import PlotlyJSONEncoder
+
+
+no_data_fig = dict(
+    layout=dict(
+        xaxis={"visible": False},
+        yaxis={"visible": False},
+        autosize=True,
+        height=200,
+        margin=dict(l=40, r=20, b=20, t=20, pad=1),
+        annotations=[
+            dict(
+                text="No Available Data",
+                xref="paper",
+                yref="paper",
+                showarrow=False,
+                font={"size": 14},
+            )
+        ],
+    )
+)
+
+
+def thickness_change_trace(reference_date, year, thickness_chg):
+    """Single scatter trace of REFERENCE_DATE to YEAR segments separated by NaN gaps"""
+
+    num_segments = len(year)
+
+    # Each segment is (start, end, gap); the final gap is dropped
+    x = np.full((num_segments, 3), np.nan)
+    x[:, 0] = reference_date
+    x[:, 1] = year
+    y = np.full((num_segments, 3), np.nan)
+    y[:, 0] = thickness_chg
+    y[:, 1] = thickness_chg
+    customdata = np.repeat(np.column_stack([reference_date, year]), 3, axis=0)
+
+    return dict(
+        type="scatter",
+        mode="lines+markers",
+        x=x.ravel()[:-1],
+        y=y.ravel()[:-1],
+        customdata=customdata[:-1],
+        connectgaps=False,
+        showlegend=False,
+        hovertemplate="%{customdata[0]:.0f} to %{customdata[1]:.0f}: %{y:.0f}<extra></extra>",
+    )
+
+
+def widen_float32(values):
+    """float32 values as float64 with their shortest decimal form, e.g. 38.54 rather than 38.540000915527344"""
+
+    if values.dtype == np.float32:
+        return values.astype(str).astype(np.float64)
+    return values
+
+
+def glacier_figures(df_t, df_mb, df_l, df_a):
+    """Thickness change, mass balance, length, and area figures for one glacier
+
+    Each argument maps column names to arrays, as returned by TimeSeriesIndex.get
+    """
+
+    df_t, df_mb, df_l, df_a = [
+        {column: widen_float32(values) for column, values in ts.items()}
+        for ts in [df_t, df_mb, df_l, df_a]
+    ]
+
+    thickness_fig = massbalance_fig = length_fig = area_fig = no_data_fig
+
+    if len(df_t["YEAR"]):
+        traces = [
+            thickness_change_trace(
+                df_t["REFERENCE_DATE"], df_t["YEAR"], df_t["THICKNESS_CHG"]
+            )
+        ]
+
+        thickness_fig = dict(
+            data=traces,
+            layout=dict(
+                autosize=True,
+                height=200,
+                margin=dict(l=45, r=20, b=20, t=20, pad=1),
+                yaxis=dict(tickformat=".0f"),
+            ),
+        )
+
+    if len(df_mb["YEAR"]):
+        massbalance_fig = dict(
+            data=[
+                dict(
+                    type="bar",
+                    x=df_mb["YEAR"],
+                    y=df_mb["ANNUAL_BALANCE"],
+                    width=1,
+                    marker=dict(opacity=0.3,),
+                )
+            ],
+            layout=dict(
+                autosize=True,
+                height=200,
+                xaxis=dict(tickformat=".0f"),
+                margin=dict(l=40, r=20, b=20, t=20, pad=1),
+            ),
+        )
+
+    if len(df_l["YEAR"]):
+        length_fig = dict(
+            data=[
+                dict(
+                    type="scatter",
+                    orientation="h",
+                    x=df_l["YEAR"],
+                    y=df_l["LENGTH"],
+                    width=1,
+                    marker=dict(size=12, opacity=0.3,),
+                    line=dict(dash="dot"),
+                )
+            ],
+            layout=dict(
+                mode="lines+markers",
+                autosize=True,
+                height=200,
+                margin=dict(l=50, r=20, b=20, t=20, pad=1),
+                yaxis=dict(tickformat=".0f", rangemode="tozero"),
+            ),
+        )
+
+    if len(df_a["YEAR"]):
+        area_fig = dict(
+            data=[
+                dict(
+                    type="scatter",
+                    x=df_a["YEAR"],
+                    y=df_a["AREA"],
+                    width=1,
+                    fill="tonexty",
+                    marker=dict(color="rgb(158,202,225)", opacity=1,),
+                    line=dict(color="rgb(158,202,225)"),
+                )
+            ],
+            layout=dict(
+                autosize=True,
+                height=200,
+                margin=dict(l=40, r=20, b=20, t=20, pad=1),
+                xaxis=dict(tickformat=".0f"),
+            ),
+        )
+
+    return thickness_fig, massbalance_fig, length_fig, area_fig
+
+
+def write_figure_bundle(path, figures, compression=6):
+    """Write (wgms_id, figures) pairs as JSON records plus an offset index
+
+    Records are concatenated in `path`, zlib compressed unless `compression` is 0,
+    and located through the sorted (WGMS_ID, offset, length) array saved to
+    `path + ".index.npy"`.
+    """
+
+    index = []
+    offset = 0
+    with open(path, "wb") as f:
+        for wgms_id, glacier_figs in figures:
+            record = json.dumps(glacier_figs, cls=PlotlyJSONEncoder).encode()
+            if compression:
+                record = zlib.compress(record, compression)
+            f.write(record)
+            index.append((wgms_id, offset, len(record)))
+            offset += len(record)
+
+    index = np.array(
+        index, dtype=[("WGMS_ID", "i8"), ("offset", "i8"), ("length", "i8")]
+    )
+    np.save(path + ".index.npy", np.sort(index, order="WGMS_ID"))
+
+
+class FigureBundle:
+    """Read-only, memory mapped view of a bundle written by write_figure_bundle"""
+
+    def __init__(self, path):
+        self.index = np.load(path + ".index.npy")
+        self.wgms_ids = self.index["WGMS_ID"]
+
+        with open(path, "rb") as f:
+            # mmap cannot map an empty file
+            self.data = b""
+            if self.index["length"].sum():
+                self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return len(self.index)
+
+    def get(self, wgms_id):
+        """Figures for one glacier, or None if it is not in the bundle"""
+
+        i = np.searchsorted(self.wgms_ids, wgms_id)
+        if i == len(self.wgms_ids) or self.wgms_ids[i] != wgms_id:
+            return None
+
+        _, offset, length = self.index[i]
+        record = self.data[offset : offset + length]
+
+        # Uncompressed records are JSON arrays
+        if record[:1] != b"[":
+            record = zlib.decompress(record)
+        return json.loads(record)
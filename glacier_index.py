@@ -0,0 +1,404 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+
+# Dropdown codes selected when a dropdown is left empty
+dropdown_all = list(range(11))
+
+
+class GlacierFilterIndex:
+    """Bitmap index over the filterable columns of the compiled glacier table
+
+    Each categorical code and time series flag is stored as a packed bitmap, and
+    FIRST_MEAS / YEAR_MEASUREMENTS as sorted arrays, so a filter request is a few
+    bitwise ANDs instead of a chain of DataFrame.query() copies.
+    """
+
+    category_columns = ["PRIM_CLASSIFIC", "FORM", "FRONTAL_CHARS"]
+    flag_columns = ["MASS_BALANCE_TS", "LENGTH_TS", "THICKNESS_CHANGE_TS", "AREA_TS"]
+
+    def __init__(self, df):
+        self.size = len(df.index)
+        self.full = np.packbits(np.ones(self.size, dtype=bool))
+
+        # One bitmap per distinct code of each categorical column
+        self.category_bitmaps = {}
+        for column in self.category_columns:
+            codes = df[column].to_numpy()
+            self.category_bitmaps[column] = {
+                value: np.packbits(codes == value) for value in np.unique(codes)
+            }
+
+        self.flag_bitmaps = {
+            column: np.packbits(df[column].to_numpy() == True)
+            for column in self.flag_columns
+        }
+
+        # Row positions ordered by value, for the two range filters
+        self.first_meas = self._sorted(df["FIRST_MEAS"])
+        self.years_data = self._sorted(df["YEAR_MEASUREMENTS"])
+
+    def _sorted(self, series):
+        values = series.to_numpy(dtype=float)
+        rows = np.flatnonzero(~np.isnan(values))
+        order = rows[np.argsort(values[rows], kind="stable")]
+        return order, values[order]
+
+    def _rows_bitmap(self, rows):
+        mask = np.zeros(self.size, dtype=bool)
+        mask[rows] = True
+        return np.packbits(mask)
+
+    def _at_most(self, index, value):
+        order, values = index
+        k = np.searchsorted(values, value, side="right")
+        if k == self.size:
+            return None
+        return self._rows_bitmap(order[:k])
+
+    def _at_least(self, index, value):
+        order, values = index
+        k = np.searchsorted(values, value, side="left")
+        if k == 0 and len(order) == self.size:
+            return None
+        return self._rows_bitmap(order[k:])
+
+    def _category(self, column, selected):
+        bitmaps = self.category_bitmaps[column]
+        present = {value for value in selected if value in bitmaps}
+        if len(present) == len(bitmaps):
+            return None
+
+        bitmap = np.zeros_like(self.full)
+        for value in present:
+            np.bitwise_or(bitmap, bitmaps[value], out=bitmap)
+        return bitmap
+
+    def mask(
+        self,
+        first_meas,
+        years_data,
+        prim_classific,
+        form,
+        frontal_chars,
+        checkbox_mb,
+        checkbox_length,
+        checkbox_tc,
+        checkbox_area,
+    ):
+        """Boolean row mask of glaciers matching the selection filters"""
+
+        bitmaps = [
+            self._at_most(self.first_meas, first_meas),
+            self._at_least(self.years_data, years_data),
+        ]
+
+        # Default is to display all data
+        for column, selected in zip(
+            self.category_columns, [prim_classific, form, frontal_chars]
+        ):
+            bitmaps.append(self._category(column, selected or dropdown_all))
+
+        for column, checkbox in zip(
+            self.flag_columns,
+            [checkbox_mb, checkbox_length, checkbox_tc, checkbox_area],
+        ):
+            if checkbox == [1]:
+                bitmaps.append(self.flag_bitmaps[column])
+
+        bitmap = self.full.copy()
+        for other in bitmaps:
+            if other is not None:
+                np.bitwise_and(bitmap, other, out=bitmap)
+
+        return np.unpackbits(bitmap, count=self.size).view(bool)
+
+
+class GlacierPositions:
+    """Position of each WGMS_ID in an array of them, found by binary search
+
+    A dictionary of Python ints would do the same, but each lookup writes to the
+    reference count of the ints it returns, so workers forked from a master that
+    built it (gunicorn --preload) copy its pages as glaciers are selected. These
+    arrays are only ever read.
+    """
+
+    def __init__(self, wgms_ids):
+        # Searching a narrower array for a Python int would convert all of it
+        wgms_ids = np.asarray(wgms_ids, dtype=np.int64)
+        self.order = np.argsort(wgms_ids, kind="stable")
+        self.wgms_ids = wgms_ids[self.order]
+
+    def __len__(self):
+        return len(self.wgms_ids)
+
+    def __contains__(self, wgms_id):
+        return self.get(wgms_id) is not None
+
+    def __getitem__(self, wgms_id):
+        i = self.get(wgms_id)
+        if i is None:
+            raise KeyError(wgms_id)
+        return i
+
+    def get(self, wgms_id, default=None):
+        """Position of `wgms_id`, or `default` if it is not in the array"""
+
+        i = np.searchsorted(self.wgms_ids, wgms_id)
+        if i == len(self.wgms_ids) or self.wgms_ids[i] != wgms_id:
+            return default
+        return int(self.order[i])
+
+
+class StringColumn:
+    """Strings packed into one UTF-8 buffer with offsets, read-only like GlacierPositions
+
+    Indexing decodes a new str rather than handing out a shared object. Values
+    are converted with str().
+    """
+
+    def __init__(self, values):
+        encoded = [str(value).encode() for value in values]
+        self.offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=self.offsets[1:])
+        self.data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.data[self.offsets[i] : self.offsets[i + 1]].tobytes().decode()
+
+
+class TimeSeriesIndex:
+    """Time series table sorted by WGMS_ID, with CSR-style offsets per glacier
+
+    A glacier lookup is a binary search followed by slicing contiguous NumPy
+    arrays, so no rows are scanned or copied.
+    """
+
+    def __init__(self, df):
+        # Tables written by data_import.py are already sorted; keep their arrays
+        # (and memory mapped pages) rather than copying them
+        if not df["WGMS_ID"].is_monotonic_increasing:
+            df = df.sort_values("WGMS_ID", kind="mergesort")
+        ids = df["WGMS_ID"].to_numpy()
+
+        self.columns = {
+            column: df[column].to_numpy()
+            for column in df.columns
+            if column != "WGMS_ID"
+        }
+
+        # Rows of glacier i are offsets[i]:offsets[i + 1]
+        wgms_ids, starts = np.unique(ids, return_index=True)
+        self.wgms_ids = wgms_ids
+        self.offsets = np.append(starts, len(ids))
+        self.positions = GlacierPositions(wgms_ids)
+
+    def __contains__(self, wgms_id):
+        return wgms_id in self.positions
+
+    def get(self, wgms_id):
+        """Dictionary of column arrays (views) for one glacier; empty if it has no data"""
+
+        i = self.positions.get(wgms_id)
+        start, stop = (0, 0) if i is None else self.offsets[i : i + 2]
+        return {column: values[start:stop] for column, values in self.columns.items()}
+
+    def counts(self, wgms_ids):
+        """Number of rows for each of `wgms_ids`, zero for glaciers without data"""
+
+        wgms_ids = np.asarray(wgms_ids)
+        if not len(self.wgms_ids):
+            return np.zeros(len(wgms_ids), dtype=int)
+
+        positions = np.searchsorted(self.wgms_ids, wgms_ids)
+        positions[positions == len(self.wgms_ids)] = 0
+
+        found = self.wgms_ids[positions] == wgms_ids
+        return np.where(found, np.diff(self.offsets)[positions], 0)
+
+
+def mercator(lon, lat):
+    """Web Mercator position of each point, as fractions of the map in [0, 1]"""
+
+    lat = np.radians(np.clip(lat, -85.0511, 85.0511))
+    x = (np.asarray(lon, dtype=float) + 180) / 360
+    y = (1 - np.log(np.tan(lat) + 1 / np.cos(lat)) / np.pi) / 2
+    return x, y
+
+
+def _spread_bits(v):
+    """Put bit i of each 16-bit value at bit 2 * i"""
+
+    v = v.astype(np.int64)
+    for shift, bits in [
+        (8, 0x00FF00FF),
+        (4, 0x0F0F0F0F),
+        (2, 0x33333333),
+        (1, 0x55555555),
+    ]:
+        v = (v | (v << shift)) & bits
+    return v
+
+
+class GlacierGrid:
+    """Spatial index of the glaciers on the Web Mercator map, for map views and clustering
+
+    Positions are quantized once to a 2**16 x 2**16 grid, so the cell of a
+    glacier at quadtree level L is its grid position shifted right by 16 - L
+    bits, and a map view is a range of cells at the level of its zoom.
+
+    Rows are also sorted by the Morton code of their grid position. Every
+    quadtree cell is then one contiguous run of that order, found by binary
+    search, so a view only touches the glaciers in its own cells instead of
+    scanning the whole table.
+    """
+
+    max_level = 16
+
+    # Views spanning more cells are looked up at a coarser level and the
+    # glaciers outside the view removed afterwards
+    max_query_cells = 1024
+
+    def __init__(self, df):
+        self.lon = df["LONGITUDE"].to_numpy(dtype=float)
+        self.lat = df["LATITUDE"].to_numpy(dtype=float)
+
+        size = 1 << self.max_level
+        x, y = mercator(self.lon, self.lat)
+        self.x = np.clip((x * size).astype(np.int64), 0, size - 1)
+        self.y = np.clip((y * size).astype(np.int64), 0, size - 1)
+
+        codes = _spread_bits(self.x) | _spread_bits(self.y) << 1
+        self.order = np.argsort(codes, kind="stable")
+        self.codes = codes[self.order]
+
+    def _cell_range(self, level, bounds, margin):
+        n = 1 << level
+        if bounds is None:
+            return level, 0, n - 1, 0, n - 1
+
+        west, east, south, north = bounds
+        (x0, x1), (y0, y1) = mercator([west, east], [north, south])
+        x0, x1 = int(np.floor(x0 * n)) - margin, int(np.floor(x1 * n)) + margin
+        if x1 < x0:
+            x1 += n
+        y0 = max(int(np.floor(y0 * n)) - margin, 0)
+        y1 = min(int(np.floor(y1 * n)) + margin, n - 1)
+        if x1 - x0 + 1 >= n:
+            x0, x1 = 0, n - 1
+        return level, x0 % n, x1 % n, y0, y1
+
+    def view(self, zoom, bounds=None, margin=1):
+        """Hashable (level, x0, x1, y0, y1) cell range of a map view
+
+        `bounds` are the (west, east, south, north) coordinates in view, if
+        known. The range is widened by `margin` cells and x wraps around the
+        antimeridian when x0 > x1.
+        """
+
+        # Mapbox draws the world 512 * 2**zoom pixels wide, cells are 64 pixels
+        level = int(np.clip(np.floor(zoom) + 3, 0, self.max_level))
+        return self._cell_range(level, bounds, margin)
+
+    def view_around(self, zoom, center, size, margin=1):
+        """Cell range of a map view of `size` (width, height) pixels centred on (lon, lat)
+
+        For views whose corners are not known. A degree of latitude spans the
+        fewest pixels at the equator, so taking its span there covers the view
+        at any latitude.
+        """
+
+        half_lon = 180 * size[0] / (512 * 2 ** zoom)
+        half_lat = 180 * size[1] / (512 * 2 ** zoom)
+        if half_lon >= 180:
+            west, east = -180, 180
+        else:
+            west = (center[0] - half_lon + 180) % 360 - 180
+            east = (center[0] + half_lon + 180) % 360 - 180
+        south = max(center[1] - half_lat, -85.0511)
+        north = min(center[1] + half_lat, 85.0511)
+        return self.view(zoom, (west, east, south, north), margin)
+
+    def _within(self, rows, view):
+        level, x0, x1, y0, y1 = view
+        shift = self.max_level - level
+        x, y = self.x[rows] >> shift, self.y[rows] >> shift
+        if x0 <= x1:
+            inside = (x >= x0) & (x <= x1)
+        else:
+            inside = (x >= x0) | (x <= x1)
+        inside &= (y >= y0) & (y <= y1)
+        return rows[inside]
+
+    def query(self, view):
+        """Rows of the glaciers inside `view`, in ascending order"""
+
+        level, x0, x1, y0, y1 = view
+        n = 1 << level
+        columns = np.arange(x0, x1 + 1 if x0 <= x1 else x1 + n + 1) % n
+        lines = np.arange(y0, y1 + 1)
+
+        # Coarsen wide views, filtering their candidates exactly below
+        coarse = level
+        while len(columns) * len(lines) > self.max_query_cells:
+            coarse -= 1
+            columns, lines = np.unique(columns >> 1), np.unique(lines >> 1)
+
+        shift = 2 * (self.max_level - coarse)
+        cells = (
+            _spread_bits(columns)[None, :] | _spread_bits(lines)[:, None] << 1
+        ).ravel()
+        starts = np.searchsorted(self.codes, cells << shift)
+        stops = np.searchsorted(self.codes, (cells + 1) << shift)
+
+        # Concatenate the runs starts[i]:stops[i] of the Morton order
+        lengths = stops - starts
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        rows = np.sort(self.order[offsets + np.arange(lengths.sum())])
+        if coarse < level:
+            rows = self._within(rows, view)
+        return rows
+
+    def bbox(self, west, east, south, north):
+        """Rows of the glaciers with coordinates inside the box, in ascending order
+
+        The box crosses the antimeridian when west > east, or east > 180.
+        """
+
+        span = east - west if east >= west else east - west + 360
+        if span >= 360:
+            west, span = -180, 360
+        else:
+            west = (west + 180) % 360 - 180
+
+        # Look up the cells of a level where the box is a few cells wide
+        (x0, x1), (y0, y1) = mercator([west, west + span], [north, south])
+        size = max(x1 - x0, y1 - y0, 2.0 ** -self.max_level)
+        level = int(np.clip(np.floor(np.log2(4 / size)), 0, self.max_level))
+        rows = self.query(self._cell_range(level, (west, west + span, south, north), 0))
+
+        lon, lat = self.lon[rows], self.lat[rows]
+        inside = ((lon - west) % 360 <= span) | (span >= 360)
+        inside &= (lat >= south) & (lat <= north)
+        return rows[inside]
+
+    def clusters(self, rows, level):
+        """Glaciers of `rows` grouped by their cell at `level`
+
+        Returns the mean longitude and latitude, number of glaciers and first
+        row of each occupied cell.
+        """
+
+        shift = self.max_level - level
+        cells = (self.y[rows] >> shift) << level | (self.x[rows] >> shift)
+        _, first, inverse, counts = np.unique(
+            cells, return_index=True, return_inverse=True, return_counts=True
+        )
+        inverse = inverse.ravel()
+        lon = np.bincount(inverse, self.lon[rows]) / counts
+        lat = np.bincount(inverse, self.lat[rows]) / counts
+        return lon, lat, counts, rows[first]
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""gunicorn settings, read from the working directory by gunicorn 20 and later
+
+With WGMS_PRELOAD=1 the master imports application.py and loads the data once,
+also when WGMS_LAZY_STARTUP is set, and forks the workers from it so they share
+those pages copy-on-write. The objects created until then are frozen out of the
+garbage collector, whose passes in the workers would otherwise write to each of
+them and copy their pages.
+"""
+
+import gc
+import os
+
+
+preload_app = bool(int(os.environ.get("WGMS_PRELOAD", 0)))
+
+if preload_app:
+    # Collections while the data loads would leave freed holes between the
+    # long-lived objects, which the workers then fill, dirtying shared pages
+    gc.disable()
+
+
+def when_ready(server):
+    if server.cfg.preload_app:
+        import application
+
+        application.load_datasets()
+        # The loaded data is frozen, so collecting again in the master, which
+        # lives on to manage and re-fork the workers, leaves it untouched
+        gc.freeze()
+        gc.enable()
+
+
+def pre_fork(server, worker):
+    if server.cfg.preload_app:
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    gc.enable()
@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+
+import string
+
+import numpy as np
+import pandas as pd
+
+
+# Time series are aggregated to one row per (WGMS_ID, YEAR)
+key_columns = ["WGMS_ID", "YEAR"]
+
+
+def _encode_keys(wgms_id, year):
+    """Single int64 key per (WGMS_ID, YEAR) row, ordered like the pair"""
+
+    year_min = year.min()
+    span = year.max() - year_min + 1
+    return wgms_id * span + (year - year_min), year_min, span
+
+
+def _group_median(values, group, starts, slots, width):
+    """Median of `values` within each group, ignoring NaN
+
+    Values are sorted by group. Values of groups of up to `width` rows go to
+    their `slots` in a NaN padded matrix with one row per group, which is
+    sorted in place, putting NaN last. The few larger groups, with a slot of
+    -1, are sorted by (group, value) instead.
+    """
+
+    num_groups = len(starts)
+    small = slots >= 0
+    matrix = np.full(num_groups * width, np.nan)
+    if small.all():
+        matrix[slots] = values
+    else:
+        matrix[slots[small]] = values[small]
+    matrix.reshape(num_groups, width).sort(axis=1)
+
+    # Rows without values pick their first entry, which is NaN; the rows of
+    # the larger groups are all NaN and filled in below
+    notna = ~np.isnan(values)
+    valid = np.minimum(np.add.reduceat(notna.astype(np.int64), starts), width)
+    row_starts = np.arange(0, num_groups * width, width)
+    lower = matrix[row_starts + np.maximum(valid - 1, 0) // 2]
+    upper = matrix[row_starts + valid // 2]
+    medians = (lower + upper) / 2
+
+    large = ~small & notna
+    if large.any():
+        order = np.lexsort((values[large], group[large]))
+        large_group, large_values = group[large][order], values[large][order]
+        firsts = np.flatnonzero(np.r_[True, large_group[1:] != large_group[:-1]])
+        sizes = np.diff(np.r_[firsts, len(large_group)])
+        medians[large_group[firsts]] = (
+            large_values[firsts + (sizes - 1) // 2] + large_values[firsts + sizes // 2]
+        ) / 2
+    return medians
+
+
+def ts_median(df, columns):
+    """One row per (WGMS_ID, YEAR) with the median of the remaining `columns`
+
+    Same output as df.loc[:, columns].groupby(columns[0:2], as_index=False).median(),
+    computed from a stable sort of integer encoded keys, which is close to free
+    for the FoG files where each glacier's rows are already together.
+    """
+
+    id_column, year_column = columns[0:2]
+    df = df.loc[:, columns]
+    if df[[id_column, year_column]].isna().any(axis=None):
+        df = df.dropna(subset=[id_column, year_column])
+    if df.empty:
+        return df.astype({c: "float64" for c in columns[2:]}).reset_index(drop=True)
+
+    keys, year_min, span = _encode_keys(
+        df[id_column].to_numpy().astype(np.int64),
+        df[year_column].to_numpy().astype(np.int64),
+    )
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    counts = np.diff(np.r_[starts, len(keys)])
+    group = np.repeat(np.arange(len(starts)), counts)
+
+    # Matrix rows are wide enough for every group unless that would take more
+    # than four times the memory of the values themselves
+    width = int(min(counts.max(), 4 * len(keys) // len(counts)))
+    slots = group * width + np.arange(len(keys)) - starts[group]
+    slots[counts[group] > width] = -1
+
+    out = {
+        id_column: (keys[starts] // span).astype(df[id_column].dtype),
+        year_column: (keys[starts] % span + year_min).astype(df[year_column].dtype),
+    }
+    for column in columns[2:]:
+        values = df[column].to_numpy().astype(np.float64)[order]
+        out[column] = _group_median(values, group, starts, slots, width)
+    return pd.DataFrame(out)
+
+
+def parse_reference_year(values):
+    """Year of each REFERENCE_DATE, as int(str(x)[0:4]) but vectorized
+
+    Dates are YYYYMMDD numbers. Integer valued numbers with at least four digits
+    are divided down to their leading four digits; anything else goes through
+    the string conversion.
+    """
+
+    values = pd.Series(values)
+    if values.dtype.kind in "iuf":
+        x = values.to_numpy(dtype=np.float64)
+        if ((x >= 1000) & (x < 1e15) & (x == np.floor(x))).all():
+            digits = np.searchsorted(10.0 ** np.arange(16), x, side="right")
+            return pd.Series(
+                (x // 10.0 ** (digits - 4)).astype(np.int64),
+                index=values.index,
+                name=values.name,
+            )
+    return values.astype(str).str[0:4].astype(np.int64)
+
+
+def stream_ts_median(path, columns, chunksize, dropna=(), transform=None):
+    """Per-(WGMS_ID, YEAR) medians of `columns` of the CSV at `path`, read in chunks
+
+    Only `columns` are parsed. Rows missing a key or a value in `dropna` are
+    dropped, and `transform` is applied to each chunk before it is aggregated.
+
+    The rows of each glacier must be contiguous, as they are in the FoG files.
+    Once a chunk moves past a glacier its medians are final, so only the rows of
+    the last glacier in the chunk are carried over to the next one and peak
+    memory is bounded by `chunksize` rather than by the size of the file.
+    """
+
+    reader = pd.read_csv(
+        path,
+        usecols=columns,
+        dtype=dict.fromkeys(columns, "float64"),
+        chunksize=chunksize,
+    )
+
+    medians = []
+    finished = np.empty(0, dtype=np.int64)
+    carry = None
+    for chunk in reader:
+        chunk = chunk.dropna(subset=key_columns + list(dropna))
+        if chunk.empty:
+            continue
+        chunk = chunk.astype(dict.fromkeys(key_columns, "int64")).loc[:, columns]
+        if transform is not None:
+            chunk = transform(chunk)
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+
+        ids = chunk["WGMS_ID"].to_numpy()
+        if np.isin(ids, finished).any():
+            raise ValueError(
+                f"Rows of each glacier are not contiguous in {path}, read it whole"
+            )
+
+        done = ids != ids[-1]
+        if done.any():
+            medians.append(ts_median(chunk[done], columns))
+            finished = np.union1d(finished, ids[done])
+        carry = chunk[~done]
+
+    if carry is not None:
+        medians.append(ts_median(carry, columns))
+    if not medians:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(medians).sort_values(key_columns, ignore_index=True)
+
+
+def join_glaciers(df, tables, defaults):
+    """Left join per-glacier `tables` onto `df` by WGMS_ID, in one pass
+
+    The WGMS_IDs of `df` are hashed once and each table's (unique) WGMS_IDs
+    looked up in it, giving the table row of every glacier. Each column is
+    taken in that order, filled with `defaults`, {column: value}, and added to
+    `df`, so the frame is never copied as a whole the way each merge copies it.
+    """
+
+    df = df.reset_index(drop=True)
+    for column in df.columns.intersection(list(defaults)):
+        df[column] = df[column].fillna(defaults[column])
+
+    index = pd.Index(df["WGMS_ID"])
+    for table in tables:
+        if not table["WGMS_ID"].is_unique:
+            raise ValueError("WGMS_ID is not unique in a joined table")
+
+        # Table row of each glacier, -1 when it has none
+        found = index.get_indexer(table["WGMS_ID"])
+        rows = np.full(len(index), -1, dtype=np.intp)
+        rows[found[found >= 0]] = np.flatnonzero(found >= 0)
+
+        has_row = rows >= 0
+        for column in table.columns.drop("WGMS_ID"):
+            values = table[column]
+            if column in defaults and values.dtype.kind in "biu":
+                # Without missing values only glaciers lacking a row take the default
+                values = np.where(has_row, values.to_numpy()[rows], defaults[column])
+            else:
+                values = pd.Series(values.array.take(rows, allow_fill=True))
+                if column in defaults:
+                    values = values.fillna(defaults[column])
+            df[column] = values
+    return df
+
+
+# Parse and clean steps of data_import.py. They live in this module, rather than
+# in the notebook, so worker processes can import them
+
+
+def parse_A(path):
+    """Glacier table with capitalized names and float classification codes"""
+
+    df_A = pd.read_csv(path)
+    df_A.dropna(axis="rows", subset=["LONGITUDE", "LATITUDE"], inplace=True)
+
+    # Prettify Capitalization
+    df_A["NAME"] = df_A["NAME"].apply(lambda x: string.capwords(x))
+
+    notna = df_A["SPEC_LOCATION"].notna()
+    df_A.loc[notna, "SPEC_LOCATION"] = df_A.loc[notna, "SPEC_LOCATION"].apply(
+        lambda x: string.capwords(str(x))
+    )
+
+    # Change to Float for Consistency
+    df_A["PRIM_CLASSIFIC"] = df_A["PRIM_CLASSIFIC"].astype(float)
+    df_A["FORM"] = df_A["FORM"].replace(" ", np.nan).astype(float)
+    df_A["FRONTAL_CHARS"] = df_A["FRONTAL_CHARS"].astype(float)
+
+    return df_A
+
+
+def parse_B(path):
+    """State table without rows of unknown year"""
+
+    df_B = pd.read_csv(path)
+    return df_B.query("YEAR > 0")
+
+
+def reference_year(df_D_):
+    """Replace REFERENCE_DATE by its year"""
+
+    df_D_["REFERENCE_DATE"] = parse_reference_year(df_D_["REFERENCE_DATE"])
+    return df_D_
+
+
+def parse_D(path, th_columns, transform):
+    """Complete rows of the change table's `th_columns`, passed through `transform`"""
+
+    df_D = pd.read_csv(path)
+    df_D_ = df_D.loc[:, th_columns]
+    df_D_.dropna(axis=0, how="any", inplace=True)
+    return transform(df_D_)
+
+
+def parse_EE(path):
+    """Mass balance table without rows missing the annual balance"""
+
+    df_EE = pd.read_csv(path)
+    return df_EE.dropna(axis="rows", subset=["ANNUAL_BALANCE"])
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import g, has_request_context, request
+
+
+# Bucket upper bounds, in seconds and bytes
+time_buckets = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+size_buckets = (1 << 10, 1 << 12, 1 << 14, 1 << 16, 1 << 18, 1 << 20, 1 << 22)
+
+
+class Histogram:
+    """Cumulative histogram per combination of label values, as Prometheus expects"""
+
+    def __init__(self, name, help, labels, buckets):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, values, amount):
+        """Record `amount` for the label `values`, a tuple matching `labels`"""
+
+        with self._lock:
+            series = self._series.get(values)
+            if series is None:
+                series = self._series[values] = [[0] * len(self.buckets), 0.0, 0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if amount <= bound:
+                    counts[i] += 1
+            series[1] += amount
+            series[2] += 1
+
+    def render(self):
+        """Lines of the Prometheus text exposition format"""
+
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted(self._series.items())
+            series = [
+                (values, list(counts), *rest) for values, (counts, *rest) in series
+            ]
+        for values, counts, total, count in series:
+            labels = ",".join(f'{k}="{v}"' for k, v in zip(self.labels, values))
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(
+                    f'{self.name}_bucket{{{labels},le="{bound}"}} {bucket_count}'
+                )
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total}")
+            lines.append(f"{self.name}_count{{{labels}}} {count}")
+        return lines
+
+
+class CallbackMetrics:
+    """Latency and payload histograms of the Dash callbacks of one process
+
+    instrument() wraps every callback registered afterwards, recording its wall
+    and CPU time, and hooks the Flask server to record the time and response
+    size of each /_dash-update-component request, as well as the time between
+    the callback returning and the response being ready, which is mostly JSON
+    serialization. Callbacks time their own sub-phases with phase(), and the
+    counters of caches passed to watch_cache() are reported alongside. When not
+    enabled nothing is recorded.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.callback_seconds = Histogram(
+            "wgms_callback_seconds",
+            "Wall time of Dash callback functions",
+            ("callback",),
+            time_buckets,
+        )
+        self.callback_cpu_seconds = Histogram(
+            "wgms_callback_cpu_seconds",
+            "CPU time of Dash callback functions",
+            ("callback",),
+            time_buckets,
+        )
+        self.phase_seconds = Histogram(
+            "wgms_callback_phase_seconds",
+            "Wall time of phases within Dash callbacks",
+            ("callback", "phase"),
+            time_buckets,
+        )
+        self.request_seconds = Histogram(
+            "wgms_request_seconds",
+            "Wall time of /_dash-update-component requests",
+            ("callback",),
+            time_buckets,
+        )
+        self.response_bytes = Histogram(
+            "wgms_response_bytes",
+            "Uncompressed size of /_dash-update-component responses",
+            ("callback",),
+            size_buckets,
+        )
+        self.caches = {}
+        self._local = threading.local()
+
+    def timed(self, func):
+        """`func` recording its wall and CPU time, and the phases it reports"""
+
+        name = func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            self._local.callback = name
+            start, start_cpu = time.perf_counter(), time.thread_time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                end = time.perf_counter()
+                self._local.callback = None
+                self.callback_seconds.observe((name,), end - start)
+                self.callback_cpu_seconds.observe(
+                    (name,), time.thread_time() - start_cpu
+                )
+                if has_request_context():
+                    g.metrics_callback = name, end
+
+        return wrapper
+
+    @contextmanager
+    def phase(self, name):
+        """Time the enclosed block as phase `name` of the running callback"""
+
+        callback = getattr(self._local, "callback", None)
+        if not self.enabled or callback is None:
+            yield
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phase_seconds.observe((callback, name), time.perf_counter() - start)
+
+    def watch_cache(self, name, cache):
+        """Report the hit and miss counters of `cache`, an LRUCache, as `name`"""
+
+        self.caches[name] = cache
+
+    def _render_caches(self):
+        infos = {
+            name: cache.cache_info() for name, cache in sorted(self.caches.items())
+        }
+        lines = []
+        for metric, kind, help, field in [
+            ("wgms_cache_hits_total", "counter", "Lookups found in a cache", "hits"),
+            ("wgms_cache_misses_total", "counter", "Lookups not in a cache", "misses"),
+            ("wgms_cache_entries", "gauge", "Entries held by a cache", "currsize"),
+        ]:
+            lines += [f"# HELP {metric} {help}", f"# TYPE {metric} {kind}"]
+            for name, info in infos.items():
+                lines.append(f'{metric}{{cache="{name}"}} {getattr(info, field)}')
+        return lines
+
+    def _before_request(self):
+        if request.path.endswith("/_dash-update-component"):
+            g.metrics_start = time.perf_counter()
+
+    def _after_request(self, response):
+        start = g.pop("metrics_start", None)
+        callback = g.pop("metrics_callback", None)
+        if start is None or callback is None:
+            return response
+
+        name, callback_end = callback
+        end = time.perf_counter()
+        self.request_seconds.observe((name,), end - start)
+        self.phase_seconds.observe((name, "serialize"), end - callback_end)
+        size = response.calculate_content_length()
+        if size is None:
+            size = len(response.get_data())
+        self.response_bytes.observe((name,), size)
+        return response
+
+    def render(self):
+        """All histograms in the Prometheus text exposition format"""
+
+        lines = []
+        for histogram in [
+            self.callback_seconds,
+            self.callback_cpu_seconds,
+            self.phase_seconds,
+            self.request_seconds,
+            self.response_bytes,
+        ]:
+            lines.extend(histogram.render())
+        if self.caches:
+            lines.extend(self._render_caches())
+        return "\n".join(lines) + "\n"
+
+    def _metrics_view(self):
+        # Only served locally, for a scraper or curl on the same host
+        if request.remote_addr not in ("127.0.0.1", "::1"):
+            return "Forbidden\n", 403, {"Content-Type": "text/plain"}
+        return self.render(), 200, {"Content-Type": "text/plain; version=0.0.4"}
+
+    def instrument(self, app, path="/metrics"):
+        """Time the callbacks registered on the Dash `app` from now on, and serve them on `path`"""
+
+        if not self.enabled:
+            return
+
+        register = app.callback
+
+        def callback(*args, **kwargs):
+            decorator = register(*args, **kwargs)
+            return lambda func: decorator(self.timed(func))
+
+        app.callback = callback
+        app.server.before_request(self._before_request)
+        app.server.after_request(self._after_request)
+        app.server.add_url_rule(path, "metrics", self._metrics_view)
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import inspect
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import pandas as pd
+
+
+# Modules whose functions the stages call. Their source is part of every stage's
+# key, so editing a helper in them reruns the stages instead of serving tables
+# it would now compute differently.
+code_files = [
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+    for name in [
+        "pipeline.py",
+        "ingest.py",
+        "storage.py",
+        "figures.py",
+        "glacier_index.py",
+    ]
+]
+
+
+def checksum(value):
+    """Checksum of a stage input: file contents for paths, row hashes for DataFrames,
+    and source code for functions
+    """
+
+    digest = hashlib.sha1()
+    if callable(value):
+        digest.update(inspect.getsource(value).encode())
+    elif isinstance(value, str) and os.path.isfile(value):
+        with open(value, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    elif isinstance(value, pd.DataFrame):
+        digest.update(pd.util.hash_pandas_object(value).to_numpy().tobytes())
+        digest.update(repr(value.dtypes.to_dict()).encode())
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            digest.update(checksum(item).encode())
+    else:
+        digest.update(repr(value).encode())
+    return digest.hexdigest()
+
+
+class StageCache:
+    """Cache of data_import stage results, keyed by checksums of their inputs
+
+    A stage is skipped when its code and inputs are unchanged since the last run
+    and the files it writes still exist. The key covers the source of the stage
+    function, of functions passed to it as arguments and of the modules in
+    `code_files`, but not of helpers defined elsewhere, such as in the notebook.
+    Each stage's wall time is recorded so report() can summarize the run.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.timings = []
+        self.version = checksum(code_files)
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, name):
+        return os.path.join(self.directory, f"{name}.pkl")
+
+    @contextmanager
+    def timed(self, name, status="ran"):
+        start = time.perf_counter()
+        yield
+        self.timings.append((name, status, time.perf_counter() - start))
+
+    def _load(self, name, key, outputs=()):
+        """(True, result) when stage `name` is cached under `key`, else (False, None)"""
+
+        if os.path.exists(self._path(name)) and all(map(os.path.exists, outputs)):
+            with open(self._path(name), "rb") as f:
+                cached = pickle.load(f)
+            if cached["key"] == key:
+                return True, cached["result"]
+        return False, None
+
+    def _store(self, name, key, result):
+        with open(self._path(name), "wb") as f:
+            pickle.dump(dict(key=key, result=result), f, pickle.HIGHEST_PROTOCOL)
+
+    def run(self, name, func, *args, outputs=()):
+        """Result of func(*args), reusing the cached result when nothing changed"""
+
+        start = time.perf_counter()
+        key = checksum([self.version, func, list(args)])
+
+        hit, result = self._load(name, key, outputs)
+        if hit:
+            self.timings.append((name, "cached", time.perf_counter() - start))
+            return result
+
+        result = func(*args)
+        self._store(name, key, result)
+
+        self.timings.append((name, "ran", time.perf_counter() - start))
+        return result
+
+    def run_many(self, jobs, processes=1):
+        """Results of independent stages {name: (func, *args)}, run in a process pool
+
+        Stage functions must be importable by the workers. Times of stages run
+        in the pool are listed as "pooled", and the wall time of the pool as a
+        whole as "pool".
+        """
+
+        if processes <= 1:
+            return {name: self.run(name, *job) for name, job in jobs.items()}
+
+        start = time.perf_counter()
+        results, keys, pending = {}, {}, []
+        for name, (func, *args) in jobs.items():
+            keys[name] = checksum([self.version, func, list(args)])
+            hit, results[name] = self._load(name, keys[name])
+            if hit:
+                self.timings.append((name, "cached", 0.0))
+            else:
+                pending.append(name)
+
+        if not pending:
+            return results
+
+        with ProcessPoolExecutor(min(processes, len(pending))) as pool:
+            futures = {name: pool.submit(_run_stage, *jobs[name]) for name in pending}
+            for name, future in futures.items():
+                results[name], seconds = future.result()
+                self._store(name, keys[name], results[name])
+                self.timings.append((name, "pooled", seconds))
+
+        self.timings.append(("pool", "ran", time.perf_counter() - start))
+        return results
+
+    def report(self):
+        """Print the time spent in each stage"""
+
+        for name, status, seconds in self.timings:
+            print(f"{name:<20} {status:<7} {seconds:8.2f} s")
+        total = sum(t[2] for t in self.timings if t[1] != "pooled")
+        print(f"{'total':<28} {total:8.2f} s")
+
+
+def _run_stage(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
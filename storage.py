@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sqlite3
+from contextlib import closing
+
+try:
+    from pyarrow import feather
+except ImportError:
+    # Without pyarrow tables are read from and written to pickles
+    feather = None
+
+
+# Tables written by data_import.py and loaded by application.py
+table_names = [
+    "wgms_combined",
+    "wgms_thickness",
+    "wgms_massbalance",
+    "wgms_length",
+    "wgms_area",
+]
+
+# Free text columns of the compiled glacier table, stored in the SQLite side table
+# "wgms_details.db" so the table used for filtering stays narrow
+detail_columns = [
+    "SPEC_LOCATION",
+    "EXPOS_ACC_AREA",
+    "EXPOS_ABL_AREA",
+    "REMARKS",
+    "INVESTIGATOR",
+    "SPONS_AGENCY",
+    "REFERENCE",
+]
+
+# Compact dtypes of the remaining compiled glacier columns
+combined_dtypes = {
+    "WGMS_ID": "int32",
+    "POLITICAL_UNIT": "category",
+    "GLACIER_REGION_CODE": "category",
+    "PRIM_CLASSIFIC": "int8",
+    "FORM": "int8",
+    "FRONTAL_CHARS": "int8",
+    "YEAR": "Int16",
+    "HIGHEST_ELEVATION": "float32",
+    "LOWEST_ELEVATION": "float32",
+    "FIRST_MEAS": "int16",
+    "YEAR_MEASUREMENTS": "int16",
+    "THICKNESS_CHANGE_TS": "bool",
+    "LENGTH_TS": "bool",
+    "AREA_TS": "bool",
+    "MASS_BALANCE_TS": "bool",
+}
+
+# Compact dtypes of the time series tables
+ts_dtypes = {
+    "WGMS_ID": "int32",
+    "YEAR": "int16",
+    "REFERENCE_DATE": "float32",
+    "THICKNESS_CHG": "float32",
+    "ANNUAL_BALANCE": "float32",
+    "LENGTH": "float32",
+    "AREA": "float32",
+}
+
+
+def table_path(data_dir, name):
+    """Path of table `name`, preferring Feather over pickle when both exist"""
+
+    path = os.path.join(data_dir, name)
+    if feather is not None and os.path.exists(path + ".feather"):
+        return path + ".feather"
+    return path
+
+
+def read_table(data_dir, name):
+    """Load table `name` from `data_dir`
+
+    Feather files are memory mapped, and columns without nulls are handed to
+    pandas without a copy, so workers forked from one parent share their pages.
+    """
+
+    path = table_path(data_dir, name)
+    if path.endswith(".feather"):
+        table = feather.read_table(path, memory_map=True)
+        return table.to_pandas(split_blocks=True)
+
+    # pandas is imported when the first table is read, so that importing this
+    # module, e.g. with WGMS_LAZY_STARTUP=1, does not pay for it
+    import pandas as pd
+
+    return pd.read_pickle(path)
+
+
+def write_table(df, data_dir, name):
+    """Write table `name` to `data_dir` as uncompressed Feather, or pickle without pyarrow"""
+
+    path = os.path.join(data_dir, name)
+    if feather is None:
+        df.to_pickle(path)
+    else:
+        # Compressed files cannot be memory mapped
+        feather.write_feather(
+            df.reset_index(drop=True), path + ".feather", compression="uncompressed"
+        )
+
+
+def compact_ts_dtypes(df):
+    """Downcast a time series table to the dtypes in ts_dtypes"""
+
+    return df.astype({k: v for k, v in ts_dtypes.items() if k in df.columns})
+
+
+def enforce_schema(df):
+    """Split the compiled glacier table into compact filter columns and the free text side table"""
+
+    df_details = df.loc[:, ["WGMS_ID"] + detail_columns]
+    df = df.drop(columns=detail_columns).astype(combined_dtypes)
+    return df, df_details.astype({"WGMS_ID": "int32"})
+
+
+def write_details(df, data_dir):
+    """Write the free text side table to a SQLite file keyed by WGMS_ID"""
+
+    path = os.path.join(data_dir, "wgms_details.db")
+    if os.path.exists(path):
+        os.remove(path)
+
+    columns = [c for c in df.columns if c != "WGMS_ID"]
+    values = df.loc[:, columns].astype(object)
+    values = values.where(values.notna(), None)
+    rows = zip(df["WGMS_ID"].tolist(), *[values[c].tolist() for c in columns])
+
+    with closing(sqlite3.connect(path)) as conn, conn:
+        conn.execute(
+            "CREATE TABLE details (WGMS_ID INTEGER PRIMARY KEY, "
+            + ", ".join(f"{c} TEXT" for c in columns)
+            + ")"
+        )
+        conn.executemany(f"INSERT INTO details VALUES (?{', ?' * len(columns)})", rows)
+
+
+class DetailStore:
+    """Point lookups into the side table written by write_details"""
+
+    def __init__(self, path):
+        self.uri = f"file:{path}?mode=ro"
+
+    def get(self, wgms_id):
+        """Dictionary of free text columns for one glacier, or None"""
+
+        # A connection per call keeps this safe across forked workers and threads
+        with closing(sqlite3.connect(self.uri, uri=True)) as conn:
+            cursor = conn.execute(
+                "SELECT * FROM details WHERE WGMS_ID = ?", (int(wgms_id),)
+            )
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            return dict(zip([c[0] for c in cursor.description], row))
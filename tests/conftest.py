@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from benchmarks.synthetic import load_application
+
+
+@pytest.fixture(scope="module")
+def load_app(tmp_path_factory):
+    """Function importing application.py against a small synthetic catalog
+
+    Keyword arguments are further settings of application.py, such as
+    WGMS_MAP_CLUSTERING="1", set only while it is imported.
+    """
+
+    def load(scale=0.1, seed=0, **settings):
+        with pytest.MonkeyPatch.context() as monkeypatch:
+            for key, value in settings.items():
+                monkeypatch.setenv(key, value)
+            directory = tmp_path_factory.mktemp("wgms")
+            return load_application(scale, seed, str(directory))
+
+    return load
+
+
+@pytest.fixture(scope="module")
+def app(load_app):
+    return load_app()
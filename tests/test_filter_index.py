@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""GlacierFilterIndex against the DataFrame.query() chain it replaced"""
+
+import numpy as np
+import pytest
+
+from benchmarks.filter_benchmark import query_chain_filter
+from benchmarks.synthetic import random_filter_inputs, synthetic_catalog
+from glacier_index import GlacierFilterIndex, dropdown_all
+from storage import enforce_schema
+
+
+@pytest.fixture(scope="module")
+def df():
+    return enforce_schema(synthetic_catalog(0.1, 0)[0])[0]
+
+
+@pytest.fixture(scope="module")
+def df_missing(df):
+    """df as float columns with missing codes and years, as before enforce_schema"""
+
+    rng = np.random.default_rng(1)
+    df = df.copy()
+    for column in GlacierFilterIndex.category_columns + [
+        "FIRST_MEAS",
+        "YEAR_MEASUREMENTS",
+    ]:
+        df[column] = df[column].astype(float)
+        df.loc[rng.random(len(df.index)) < 0.1, column] = np.nan
+    return df
+
+
+def check(df, index, inputs):
+    expected = query_chain_filter(df, *inputs).index
+    assert df.index[index.mask(*inputs)].equals(expected), inputs
+
+
+@pytest.mark.parametrize("frame", ["df", "df_missing"])
+def test_random_filters(frame, request):
+    df = request.getfixturevalue(frame)
+    index = GlacierFilterIndex(df)
+    for inputs in random_filter_inputs(np.random.default_rng(0), 100):
+        check(df, index, inputs)
+
+
+@pytest.mark.parametrize("frame", ["df", "df_missing"])
+def test_full_dropdowns(frame, request):
+    df = request.getfixturevalue(frame)
+    index = GlacierFilterIndex(df)
+    full = list(dropdown_all)
+    check(df, index, (2020, 0, full, full, full, None, None, None, None))
+    check(df, index, (2020, 0, [], None, full, [1], [], None, [1]))
+
+
+@pytest.mark.parametrize("frame", ["df", "df_missing"])
+def test_empty_selection(frame, request):
+    df = request.getfixturevalue(frame)
+    inputs = (1849, 0, None, None, None, None, None, None, None)
+    index = GlacierFilterIndex(df)
+    assert not index.mask(*inputs).any()
+    check(df, index, inputs)
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""join_glaciers against the merge chain it replaced"""
+
+import pandas as pd
+import pytest
+
+from benchmarks.join_benchmark import defaults, join_inputs, merge_chain
+from ingest import join_glaciers
+from storage import enforce_schema
+
+
+@pytest.fixture(scope="module")
+def inputs():
+    return join_inputs(2000, 0)
+
+
+def test_matches_merge_chain(inputs):
+    df_A, tables = inputs
+    result = join_glaciers(df_A, tables, defaults)
+    expected = merge_chain(df_A, tables)
+
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+    for df, df_expected in zip(enforce_schema(result), enforce_schema(expected)):
+        pd.testing.assert_frame_equal(df, df_expected, check_exact=True)
+
+
+def test_rejects_duplicate_glaciers(inputs):
+    df_A, tables = inputs
+    tables = [pd.concat([tables[0], tables[0].iloc[:1]])] + tables[1:]
+    with pytest.raises(ValueError, match="not unique"):
+        join_glaciers(df_A, tables, defaults)
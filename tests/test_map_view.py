@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""Map views of the clustered satellite map for relayouts without corners"""
+
+import json
+
+import pytest
+
+from benchmarks.load_test import Callbacks
+from benchmarks.map_benchmark import relayout_data
+
+
+alps = dict(zoom=7, center=dict(lon=9, lat=46))
+filters = (2020, 0, None, None, None, None, None, None, None)
+
+
+@pytest.fixture(scope="module")
+def app(load_app):
+    return load_app(WGMS_MAP_CLUSTERING="1")
+
+
+def covers(view, other):
+    """Whether the cell range `view` contains `other`, neither crossing the antimeridian"""
+
+    level, x0, x1, y0, y1 = view
+    return (
+        level == other[0]
+        and x0 <= other[1] <= other[2] <= x1
+        and y0 <= other[3] <= other[4] <= y1
+    )
+
+
+def test_resize_keeps_drawn_view(app):
+    view = app.map_view({"autosize": True}, {"layout": {"mapbox": alps}})
+    assert covers(view, app.map_view(relayout_data(7, 9, 46)))
+    assert view != app.map_grid.view(7)
+
+
+def test_reset_without_corners(app):
+    relayout = {"mapbox.zoom": 7, "mapbox.center": alps["center"]}
+    view = app.map_view(relayout)
+    assert covers(view, app.map_view(relayout_data(7, 9, 46)))
+
+    app.satellite_map_cache.cache_clear()
+    traces = app.update_satellite_map(*filters, relayout)[0]["data"]
+    assert len(traces) == 1
+    assert len(traces[0]["lon"]) < len(app.df_combined.index)
+
+
+def test_resize_prevents_update(app):
+    client = app.application.test_client()
+    callbacks = Callbacks(
+        *[
+            json.loads(client.get(path).data)
+            for path in ["/_dash-dependencies", "/_dash-layout"]
+        ]
+    )
+    values = dict(callbacks.initial_values)
+    values["mapbox.relayoutData"] = {"autosize": True}
+    values["mapbox.figure"] = {"layout": {"mapbox": alps}}
+
+    def post(changed):
+        [(name, body)] = [
+            item for item in callbacks.bodies(changed, values) if item[0] == "mapbox"
+        ]
+        return client.post(
+            "/_dash-update-component", data=body, content_type="application/json"
+        )
+
+    assert post("mapbox.relayoutData").status_code == 204
+
+    values["checkbox_mb.value"] = [1]
+    response = post("checkbox_mb.value")
+    assert response.status_code == 200
+    traces = response.get_json()["response"]["mapbox"]["figure"]["data"]
+    assert len(traces[0]["lon"]) < len(app.df_combined.index)
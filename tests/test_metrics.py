@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""Satellite map cache hits as reported on /metrics"""
+
+import pytest
+
+
+filters = (2020, 0, None, None, None, None, None, None, None)
+
+
+@pytest.fixture(scope="module")
+def app(load_app):
+    return load_app(WGMS_METRICS="1")
+
+
+def test_cache_hit_reuses_outputs(app):
+    app.satellite_map_cache.cache_clear()
+    outputs = app.update_satellite_map(*filters)
+    assert app.update_satellite_map(*filters) is outputs
+    assert app.satellite_map_cache.currbytes > 0
+
+
+def test_cache_counters_on_metrics(app):
+    app.satellite_map_cache.cache_clear()
+    app.update_satellite_map(*filters)
+    app.update_satellite_map(*filters)
+
+    lines = app.application.test_client().get("/metrics").get_data(as_text=True)
+    lines = lines.splitlines()
+    assert 'wgms_cache_hits_total{cache="satellite_map"} 1' in lines
+    assert 'wgms_cache_misses_total{cache="satellite_map"} 1' in lines
+    assert 'wgms_cache_entries{cache="satellite_map"} 1' in lines
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""num_data_points_helper against the isin() count it replaced"""
+
+import numpy as np
+
+from benchmarks.count_benchmark import isin_count
+from benchmarks.synthetic import random_filter_inputs
+
+
+def test_random_filters(app):
+    rng = np.random.default_rng(0)
+    for inputs in random_filter_inputs(rng, 50):
+        df = app.glacier_filter_helper(app.df_combined, *inputs)
+        expected = isin_count(app, df["WGMS_ID"].unique())
+        assert app.num_data_points_helper(df) == expected
+
+
+def test_all_glaciers(app):
+    expected = isin_count(app, app.df_combined["WGMS_ID"].unique())
+    assert app.num_data_points_helper(app.df_combined) == expected
+
+
+def test_empty_selection(app):
+    df = app.glacier_filter_helper(
+        app.df_combined, 1849, 0, None, None, None, None, None, None, None
+    )
+    assert len(df.index) == 0
+    assert app.num_data_points_helper(df) == 0
+    assert isin_count(app, df["WGMS_ID"].unique()) == 0
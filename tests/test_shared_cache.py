@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""Size budget of the SQLite cache shared by the workers"""
+
+import sqlite3
+
+from cache import SharedCache
+
+
+def stored_keys(cache):
+    with sqlite3.connect(cache.path) as conn:
+        return sorted(key for (key,) in conn.execute("SELECT key FROM outputs"))
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = SharedCache(str(tmp_path / "cache.db"), "v1", maxbytes=250)
+    value = "x" * 98  # 100 bytes of JSON
+    for key in range(3):
+        cache.put("map", key, value)
+    assert cache.get("map", 0) is None
+
+    cache.get("map", 1)
+    cache.put("map", 3, value)
+    assert cache.get("map", 1) == value
+    assert cache.get("map", 2) is None
+    assert cache.get("map", 3) == value
+
+
+def test_skips_values_over_budget(tmp_path):
+    cache = SharedCache(str(tmp_path / "cache.db"), "v1", maxbytes=50)
+    cache.put("map", 0, "x" * 100)
+    assert cache.get("map", 0) is None
+    assert stored_keys(cache) == []
+
+
+def test_replaces_older_schema(tmp_path):
+    path = str(tmp_path / "cache.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE outputs (version TEXT, key TEXT, value TEXT, "
+            "PRIMARY KEY (version, key))"
+        )
+    cache = SharedCache(path, "v1", maxbytes=1000)
+    cache.put("map", 0, [1, 2])
+    assert cache.get("map", 0) == [1, 2]
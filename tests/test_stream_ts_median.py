@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""stream_ts_median against reading the whole file, as data_import.py does by default"""
+
+import pandas as pd
+import pytest
+
+from benchmarks.ingest_benchmark import (
+    ee_columns,
+    reference_year,
+    th_columns,
+    whole_file_median,
+)
+from benchmarks.synthetic import raw_change_table, raw_massbalance_table
+from ingest import stream_ts_median
+
+
+@pytest.fixture(scope="module")
+def change_csv(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("fog") / "D-CHANGE.csv")
+    raw_change_table(0.02, 0).to_csv(path, index=False)
+    return path
+
+
+@pytest.mark.parametrize("chunksize", [5, 100, 10 ** 6])
+def test_change_table(change_csv, chunksize):
+    pd.testing.assert_frame_equal(
+        stream_ts_median(change_csv, th_columns, chunksize, th_columns, reference_year),
+        whole_file_median(change_csv, th_columns, th_columns, reference_year),
+        check_exact=True,
+    )
+
+
+def test_massbalance_table(tmp_path):
+    path = str(tmp_path / "EE-MASS-BALANCE.csv")
+    raw_massbalance_table(0.1, 0).to_csv(path, index=False)
+    pd.testing.assert_frame_equal(
+        stream_ts_median(path, ee_columns, 50, ["ANNUAL_BALANCE"]),
+        whole_file_median(path, ee_columns, ["ANNUAL_BALANCE"]),
+        check_exact=True,
+    )
+
+
+def test_rejects_scattered_glaciers(change_csv, tmp_path):
+    path = str(tmp_path / "shuffled.csv")
+    df = pd.read_csv(change_csv)
+    df.sample(frac=1, random_state=0).to_csv(path, index=False)
+    with pytest.raises(ValueError, match="not contiguous"):
+        stream_ts_median(path, th_columns, 100, th_columns, reference_year)
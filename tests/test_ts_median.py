@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""ts_median and parse_reference_year against the pandas code they replaced"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.aggregate_benchmark import apply_reference_year, groupby_median
+from benchmarks.synthetic import raw_change_table
+from ingest import parse_reference_year, ts_median
+
+
+columns = ["WGMS_ID", "YEAR", "THICKNESS_CHG", "REFERENCE_DATE"]
+
+
+def check(df, columns=columns):
+    pd.testing.assert_frame_equal(
+        ts_median(df, columns), groupby_median(df, columns), check_exact=True
+    )
+
+
+def test_synthetic_table():
+    df = raw_change_table(0.05, 0, text=False).loc[:, columns].dropna()
+    check(df)
+
+
+def test_missing_values_and_keys():
+    rng = np.random.default_rng(0)
+    df = raw_change_table(0.05, 0, text=False).loc[:, columns]
+    df = df.sample(frac=1, random_state=0).reset_index(drop=True)
+    for column in columns:
+        df.loc[rng.random(len(df.index)) < 0.1, column] = np.nan
+    check(df)
+
+
+def test_groups_wider_than_matrix():
+    # Many single row groups keep the matrix narrow, so the large groups,
+    # one with missing values and one without any, are sorted separately
+    rng = np.random.default_rng(0)
+    wgms_id = np.r_[np.arange(1000), np.full(300, 5000), np.full(50, 6000)]
+    values = rng.normal(size=len(wgms_id))
+    values[1000:1300:3] = np.nan
+    values[1300:] = np.nan
+    df = pd.DataFrame(
+        {
+            "WGMS_ID": wgms_id,
+            "YEAR": 2000,
+            "THICKNESS_CHG": values,
+            "REFERENCE_DATE": rng.integers(0, 5, size=len(wgms_id)).astype(float),
+        }
+    ).sample(frac=1, random_state=0)
+    check(df)
+
+
+def test_empty():
+    df = pd.DataFrame({column: pd.Series([], dtype=float) for column in columns})
+    result = ts_median(df, columns)
+    assert result.empty
+    assert list(result.columns) == columns
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        [19990101, 20001231, 1999, 20100000],
+        [19990101.0, 20001231.0, 1999.0, 2010.0],
+        [19990101.0, 1999.5, 20001231.0],
+        ["19990101", "2000", "20001231"],
+    ],
+)
+def test_reference_year(values):
+    values = pd.Series(values, name="REFERENCE_DATE", index=[5, 3, 8, 1][: len(values)])
+    pd.testing.assert_series_equal(
+        parse_reference_year(values), apply_reference_year(values)
+    )